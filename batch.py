@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from skilltree.SkillTree import SkillTree
+from skilltree.FragmentCache import FragmentCache
+from skilltree.ProgressOverlay import ProgressOverlay, load_progress
+
+# Warm state of a worker process, kept across all the files it renders
+worker_options = None
+worker_cache = None
+worker_overlay = None
+
+
+def init_worker(options):
+    global worker_options, worker_cache
+    worker_options = options
+    worker_cache = FragmentCache()
+
+
+def render_file(csv_file, output_file):
+    """
+    Renders one CSV in a worker. Returns (csv_file, output_file, seconds, error),
+    error being None on success, so one bad file doesn't stop the batch.
+    """
+    start = time.perf_counter()
+    try:
+        # Users mostly share the same trees, but don't let the cache grow forever
+        if len(worker_cache.fragments) > worker_options['cache_size']:
+            worker_cache.clear()
+
+        if not os.path.isfile(csv_file):
+            raise FileNotFoundError(f'No CSV file found at {csv_file}')
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        # Render next to the output and only put it in place once complete, so a
+        # failure midway doesn't leave a truncated (but well-formed) SVG behind
+        tmp_file = f'{output_file}.{os.getpid()}.tmp'
+        try:
+            if worker_options['base'] is not None:
+                # csv_file is a user's progress on the shared base tree
+                base_overlay().render_to(tmp_file, load_progress(csv_file))
+            else:
+                make_tree(csv_file).render_to(tmp_file, cache=worker_cache)
+            os.replace(tmp_file, output_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return csv_file, output_file, time.perf_counter() - start, error
+
+
+def make_tree(csv_file):
+    tree = SkillTree(csv_file,
+                     outer_text_mode=worker_options['outer_text'],
+                     shape_mode=worker_options['shapes'],
+                     batch_geometry=worker_options['batch_geometry'])
+    if tree.load_errors and not tree.skills:
+        # Nothing usable in it (e.g. no header), an empty SVG would pass for a success
+        line, message = tree.load_errors[0]
+        raise ValueError(f'No valid rows in {csv_file}, line {line}: {message}')
+    return tree
+
+
+def base_overlay():
+    """The base tree of this worker, rendered the first time it's needed."""
+    global worker_overlay
+    if worker_overlay is None:
+        if not os.path.isfile(worker_options['base']):
+            raise FileNotFoundError(f"No CSV file found at {worker_options['base']}")
+        worker_overlay = ProgressOverlay(make_tree(worker_options['base']), worker_cache)
+    return worker_overlay
+
+
+def find_csv_files(inputs):
+    """Expands directories in inputs to the CSV files inside them."""
+    csv_files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            csv_files.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        else:
+            csv_files.append(path)
+    return csv_files
+
+
+def output_path(template, csv_file):
+    """Fills in {name} (file name without extension) and {dir} (its directory)."""
+    name = os.path.splitext(os.path.basename(csv_file))[0]
+    return template.format(name=name, dir=os.path.dirname(csv_file))
+
+
+def shared_outputs(jobs):
+    """
+    (csv_file, error) for every job whose output path is also the output of
+    another one, e.g. a/tree.csv and b/tree.csv with the default template.
+    """
+    by_output = {}
+    for csv_file, output_file in jobs:
+        by_output.setdefault(os.path.normcase(os.path.abspath(output_file)), []).append(csv_file)
+
+    conflicts = []
+    for (csv_file, output_file) in jobs:
+        csv_files = by_output[os.path.normcase(os.path.abspath(output_file))]
+        if len(csv_files) > 1:
+            conflicts.append((csv_file, f'{output_file} would be written for each of {csv_files}, '
+                                        f'use {{dir}} in --output'))
+    return conflicts
+
+
+def render_batch(csv_files, output_template, workers=None, outer_text='chars', shapes='inline',
+                 batch_geometry=False, cache_size=200000, base=None):
+    """
+    Renders every CSV across a pool of worker processes, printing the timing of
+    each file as it finishes. Returns the list of (csv_file, error) that failed.
+    If a base tree CSV is given, the CSVs are users' progress on it instead,
+    see ProgressOverlay. CSVs that would be written to the same output path
+    are not rendered, and count as failed.
+    """
+    options = {'outer_text': outer_text,
+               'shapes': shapes,
+               'batch_geometry': batch_geometry,
+               'cache_size': cache_size,
+               'base': base}
+    jobs = [(csv_file, output_path(output_template, csv_file)) for csv_file in csv_files]
+
+    failures = shared_outputs(jobs)
+    for csv_file, error in failures:
+        print(f'{csv_file} SKIPPED: {error}')
+    skipped = {csv_file for csv_file, error in failures}
+    jobs = [(csv_file, output_file) for csv_file, output_file in jobs if csv_file not in skipped]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options,)) as pool:
+        futures = [pool.submit(render_file, csv_file, output_file) for csv_file, output_file in jobs]
+        for future in as_completed(futures):
+            csv_file, output_file, seconds, error = future.result()
+            if error is None:
+                print(f'{csv_file} -> {output_file} in {seconds:.3f}s')
+            else:
+                print(f'{csv_file} FAILED after {seconds:.3f}s: {error}')
+                failures.append((csv_file, error))
+
+    print(f'Rendered {len(csv_files) - len(failures)}/{len(csv_files)} files in {time.perf_counter() - start:.3f}s')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate SVG skill trees for many CSV files in parallel')
+    parser.add_argument('inputs', nargs='+', help='CSV files and/or directories containing CSV files')
+    parser.add_argument('--output', default='diagrams/{name}.svg',
+                        help='Output path template, {name} is the CSV name without extension and {dir} its directory')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--outer-text', choices=['chars', 'path'], default='chars')
+    parser.add_argument('--shapes', choices=['inline', 'symbol'], default='inline')
+    parser.add_argument('--batch-geometry', action='store_true')
+    parser.add_argument('--cache-size', type=int, default=200000,
+                        help='Max number of fragments each worker keeps cached between files')
+    parser.add_argument('--base', default=None, metavar='TREE_CSV',
+                        help='Treat the inputs as progress files (name, status, level) of users on this tree')
+    args = parser.parse_args()
+
+    failures = render_batch(find_csv_files(args.inputs), args.output, args.workers, args.outer_text,
+                            args.shapes, args.batch_geometry, args.cache_size, args.base)
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+
+
+def compare(old, new, threshold=1.2):
+    """
+    Prints every phase and output size of two benchmark results side by side.
+    Returns the names of the ones where new is more than threshold times old.
+    """
+    regressions = []
+    rows = [(f'{phase} (s)', stats['seconds'], new['phases'].get(phase, {}).get('seconds'))
+            for phase, stats in old['phases'].items()]
+    rows += [(f'{phase} peak (B)', stats['peak_bytes'], new['phases'].get(phase, {}).get('peak_bytes'))
+             for phase, stats in old['phases'].items() if 'peak_bytes' in stats]
+    rows += [(f'{mode} output (B)', size, new['output_bytes'].get(mode))
+             for mode, size in old['output_bytes'].items()]
+
+    for name, old_value, new_value in rows:
+        if new_value is None:
+            print(f'{name:36s} {old_value:14.6g}        missing')
+            continue
+        ratio = new_value / old_value if old_value else 1
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:36s} {old_value:14.6g} {new_value:14.6g} {ratio:6.2f}x{flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Ratio above which a phase counts as a regression')
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    if old['params'] != new['params']:
+        print(f"Warning: results were generated with different parameters: {old['params']} vs {new['params']}")
+    if compare(old, new, args.threshold):
+        raise SystemExit(1)
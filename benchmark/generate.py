@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import random
+import string
+from collections import deque
+from skilltree.SkillRecord import FIELDNAMES, STATUSES
+
+# Color names from the CSV color lookup, so generated trees render like real ones
+SKILL_COLORS = ['red', 'bronze', 'silver', 'gold', 'purple', 'blue', 'green']
+LOCKED_COLORS = ['normal-grey', 'special-grey']
+DEPENDENCY_COLORS = ['dark-red', 'dark-blue', 'dark-green']
+
+
+def random_label(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + ' ') for _ in range(length)).strip() or 'x'
+
+
+def generate_tree(size, depth=8, branching=3, label_length=12, spacing=80, seed=0):
+    """
+    Generates size skill rows forming a tree (in the CSV schema), filled breadth
+    first: every skill gets up to branching children until depth levels exist,
+    then new roots are started. Completed skills get a random level, everything
+    that depends on a locked skill is locked too.
+    """
+    rng = random.Random(seed)
+    rows = []
+    per_depth = {}  # depth -> number of skills placed at that depth, for positions
+
+    def add_skill(parent, level_depth):
+        index = len(rows)
+        column = per_depth.get(level_depth, 0)
+        per_depth[level_depth] = column + 1
+
+        if parent is None:
+            status = 'completed'
+        elif parent['status'] == 'completed':
+            status = rng.choice(STATUSES)
+        else:
+            status = 'locked'
+
+        row = {'name': f'skill{index}|{random_label(rng, 4)}',
+               'x': spacing // 2 + column * spacing,
+               'y': spacing // 2 + level_depth * spacing,
+               'dependency': parent['name'] if parent is not None else '',
+               'upper_text': random_label(rng, label_length),
+               'lower_text': random_label(rng, label_length),
+               'status': status,
+               'color': rng.choice(SKILL_COLORS),
+               'complete_inner_text_color': 'white',
+               'unlocked_outer_text_color': 'white',
+               'background_color': 'background',
+               'locked_color': rng.choice(LOCKED_COLORS),
+               'incomplete_inner_text_color': 'white',
+               'locked_outer_text_color': 'white',
+               'level': rng.randint(0, 15) if status == 'completed' else 0,
+               'dependency_color': rng.choice(DEPENDENCY_COLORS)}
+        rows.append(row)
+        return row
+
+    while len(rows) < size:
+        queue = deque([(add_skill(None, 0), 0)])
+        while queue and len(rows) < size:
+            parent, parent_depth = queue.popleft()
+            if parent_depth + 1 >= depth:
+                continue
+            for _ in range(branching):
+                if len(rows) >= size:
+                    break
+                queue.append((add_skill(parent, parent_depth + 1), parent_depth + 1))
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic skill tree CSV')
+    parser.add_argument('output')
+    parser.add_argument('--size', type=int, default=1000, help='Number of skills')
+    parser.add_argument('--depth', type=int, default=8, help='Number of levels in each tree')
+    parser.add_argument('--branching', type=int, default=3, help='Children per skill')
+    parser.add_argument('--label-length', type=int, default=12, help='Length of the upper/lower ring text')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_csv(generate_tree(args.size, args.depth, args.branching, args.label_length, seed=args.seed), args.output)
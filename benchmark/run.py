@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from benchmark.generate import generate_tree, write_csv
+from skilltree.SkillFile import SkillFile
+from skilltree.SkillTree import SkillTree
+
+SKILL_DRAW_PHASES = ['draw_base_shape', 'write_center_text', 'write_upper_text', 'write_lower_text', 'draw_stars']
+
+
+class ElementCounter:
+    """Takes the place of the drawing when timing Skill.draw, so only drawing is measured."""
+    def __init__(self):
+        self.count = 0
+
+    def append(self, element):
+        self.count += 1
+
+
+def measure(func, repeat=3, memory=True):
+    """
+    Runs func repeat times and returns the best wall time, plus the peak memory
+    of one extra run under tracemalloc (kept separate as it slows things down),
+    and the result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    stats = {'seconds': best}
+    if memory:
+        tracemalloc.start()
+        result = func()
+        stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return stats, result
+
+
+def time_skill_draw(st):
+    """Total time spent in each Skill.draw_* method over every skill of the tree."""
+    phases = {phase: 0.0 for phase in SKILL_DRAW_PHASES}
+    counter = ElementCounter()
+    for skill in st.skills:
+        skill_instance = st.make_skill(counter, skill)
+        for phase in SKILL_DRAW_PHASES:
+            start = time.perf_counter()
+            getattr(skill_instance, phase)()
+            phases[phase] += time.perf_counter() - start
+    return {phase: {'seconds': seconds} for phase, seconds in phases.items()}, counter.count
+
+
+def save_with_editor(csv_file, output_file):
+    """What SkillEditor.save_skills does, without starting the Tk window."""
+    skill_file = SkillFile(csv_file)
+    skill_file.load()
+
+    def save():
+        skill_file.save(output_file)
+    return save
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(size, depth, branching, label_length, repeat=3, memory=True, seed=0):
+    """Generates a tree of the given shape and times every stage on it. Returns a JSON-able dict."""
+    results = {'date': datetime.datetime.now().isoformat(),
+               'revision': git_revision(),
+               'python': platform.python_version(),
+               'params': {'size': size, 'depth': depth, 'branching': branching,
+                          'label_length': label_length, 'repeat': repeat, 'seed': seed},
+               'phases': {},
+               'output_bytes': {}}
+    phases = results['phases']
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, 'tree.csv')
+        write_csv(generate_tree(size, depth, branching, label_length, seed=seed), csv_file)
+        results['input_bytes'] = os.path.getsize(csv_file)
+
+        phases['csv_load'], st = measure(lambda: SkillTree(csv_file, compiled_cache=False), repeat, memory)
+        SkillTree(csv_file)  # Writes the compiled cache
+        phases['csv_load_compiled'], _ = measure(lambda: SkillTree(csv_file), repeat, memory)
+
+        phases['render'], drawing = measure(st.render, repeat, memory)
+        phases['serialize'], svg = measure(drawing.as_svg, repeat, memory)
+        results['output_bytes']['render'] = len(svg.encode('utf-8'))
+
+        stream_file = os.path.join(tmp_dir, 'stream.svg')
+        phases['render_stream'], _ = measure(lambda: st.render_to(stream_file), repeat, memory)
+        results['output_bytes']['render_stream'] = os.path.getsize(stream_file)
+
+        path_symbol = SkillTree(csv_file, outer_text_mode='path', shape_mode='symbol')
+        phases['render_path_symbol'], drawing = measure(path_symbol.render, repeat, memory)
+        results['output_bytes']['render_path_symbol'] = len(drawing.as_svg().encode('utf-8'))
+
+        compact = SkillTree(csv_file, compact=True)
+        phases['render_compact'], drawing = measure(compact.render, repeat, memory)
+        results['output_bytes']['render_compact'] = len(drawing.as_svg().encode('utf-8'))
+
+        skill_draw, element_count = time_skill_draw(st)
+        phases.update({f'skill.{phase}': stats for phase, stats in skill_draw.items()})
+        results['elements'] = element_count
+
+        phases['editor_save'], _ = measure(save_with_editor(csv_file, os.path.join(tmp_dir, 'saved.csv')),
+                                           repeat, memory)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark loading, rendering and saving a synthetic skill tree')
+    parser.add_argument('--size', type=int, default=2000, help='Number of skills')
+    parser.add_argument('--depth', type=int, default=8)
+    parser.add_argument('--branching', type=int, default=3)
+    parser.add_argument('--label-length', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per phase, the best one is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Don't measure peak memory (faster)")
+    parser.add_argument('--output', default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.size, args.depth, args.branching, args.label_length,
+                             args.repeat, not args.no_memory, args.seed)
+
+    for phase, stats in results['phases'].items():
+        memory = f"  peak {stats['peak_bytes'] / 1e6:8.2f} MB" if 'peak_bytes' in stats else ''
+        print(f"{phase:28s} {stats['seconds'] * 1000:10.2f} ms{memory}")
+    for mode, size in results['output_bytes'].items():
+        print(f'{mode:28s} {size / 1e3:10.1f} kB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -5,11 +5,14 @@ Created on Sat Dec 21 14:48:06 2024
 @author: funky
 """
 
-import csv
+import math
 import tkinter as tk
+from skilltree.SkillFile import SkillFile
+from skilltree.SkillGraph import SkillGraph
+from skilltree.SpatialGrid import SpatialGrid, rects_intersect, segment_intersects_rect
 
 class SkillEditor:
-    def __init__(self, csv_file, grid_size=10, multiplier=2):
+    def __init__(self, csv_file, grid_size=10, multiplier=2, save_delay=2000):
         # Hard coded node radius
         self.radius = 15
         self.size = 800
@@ -17,19 +20,43 @@ class SkillEditor:
         self.multiplier = multiplier
         
         self.csv_file = csv_file
-        self.skills = self.load_skills_from_csv()
+        # Moves are logged to the journal right away, and written to the CSV
+        # once nothing has moved for save_delay milliseconds
+        self.file = SkillFile(csv_file, multiplier)
+        self.save_delay = save_delay
+        self.save_job = None
+        self.skills = self.file.load()
 
         # Setup Tkinter
         self.root = tk.Tk()
         self.canvas = tk.Canvas(self.root, width=self.size, height=self.size, bg="white")
-        self.canvas.pack()
+        self.canvas.pack(fill="both", expand=True)
 
-        # Draw grid and skills
-        self.draw_grid()
-        self.draw_skills()
-
-        # List to track selected nodes
+        # Indices of the selected skills, and the same as a set
         self.selected_skills = []
+        self.selected_set = set()
+
+        # The view: world (editor) coordinates of the top left corner, and zoom.
+        # Only what's inside it has canvas items, see render_view.
+        self.view_x = 0
+        self.view_y = 0
+        self.zoom = 1.0
+        self.detail_zoom = 0.5  # Below this zoom, nodes are drawn as dots without labels
+        self.node_items = {}    # skill index -> [circle, text or None]
+        self.edge_items = {}    # edge index -> line
+        self.grid_items = []    # grid lines, the ones not needed are hidden
+        self.pools = {'oval': [], 'text': [], 'line': []}  # Hidden items ready to be reused
+        self.pan_start = None
+
+        # Index dependencies and skills, then draw what's in view
+        self.build_edges()
+        self.build_spatial_index()
+        self.render_view()
+
+        # Rubber band rectangle while dragging on empty canvas, see on_click
+        self.band = None
+        self.band_start = None
+        self.band_additive = False
 
         # Create Save button
         self.save_button = tk.Button(self.root, text="Save", command=self.save_skills)
@@ -38,95 +65,300 @@ class SkillEditor:
         # Bind mouse click, drag events, and key press for movement
         self.canvas.bind("<Button-1>", self.on_click)
         self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_release)
+        # Pan with the right (or middle) button, zoom with the wheel
+        for button in ['2', '3']:
+            self.canvas.bind(f"<ButtonPress-{button}>", self.on_pan_start)
+            self.canvas.bind(f"<B{button}-Motion>", self.on_pan)
+        self.canvas.bind("<MouseWheel>", self.on_zoom)
+        self.canvas.bind("<Button-4>", self.on_zoom)
+        self.canvas.bind("<Button-5>", self.on_zoom)
+        self.canvas.bind("<Configure>", lambda event: self.render_view())
         self.root.bind("<KeyPress-Left>", self.move_selected_nodes)
         self.root.bind("<KeyPress-Right>", self.move_selected_nodes)
         self.root.bind("<KeyPress-Up>", self.move_selected_nodes)
         self.root.bind("<KeyPress-Down>", self.move_selected_nodes)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Focus on root to listen to key presses
         self.root.focus_set()
 
         self.root.mainloop()
 
-    def load_skills_from_csv(self):
-        """Load skills from CSV and apply multiplier when reading coordinates."""
-        skills = []
-        try:
-            with open(self.csv_file, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    skill = {
-                        "name": row['name'],
-                        "x": int(row['x']) / self.multiplier,  # Apply multiplier
-                        "y": int(row['y']) / self.multiplier,  # Apply multiplier
-                        "dependency": row['dependency'],
-                        "upper_text": row['upper_text'],
-                        "lower_text": row['lower_text'],
-                        "status": row['status'],
-                        "color": row['color'],
-                        "complete_inner_text_color": row['complete_inner_text_color'],
-                        "unlocked_outer_text_color": row['unlocked_outer_text_color'],
-                        "background_color": row['background_color'],
-                        "locked_color": row['locked_color'],
-                        "incomplete_inner_text_color": row['incomplete_inner_text_color'],
-                        "locked_outer_text_color": row['locked_outer_text_color'],
-                        "level": int(row['level']),
-                        "dependency_color": row['dependency_color']}
-                    skills.append(skill)
-        except FileNotFoundError:
-            print("No CSV file found, starting with empty skill set.")
-        return skills
-
-    def draw_grid(self):
-        """Draws a grid on the canvas for visual feedback."""
+    def to_screen(self, x, y):
+        return (x - self.view_x) * self.zoom, (y - self.view_y) * self.zoom
+
+    def to_world(self, x, y):
+        return self.view_x + x / self.zoom, self.view_y + y / self.zoom
+
+    def viewport(self):
+        """The part of the world in view, as (x, y, width, height)."""
         width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
-        for x in range(0, width, self.grid_size):
-            self.canvas.create_line(x, 0, x, height, fill="lightgray", dash=(2, 2))
-        for y in range(0, height, self.grid_size):
-            self.canvas.create_line(0, y, width, y, fill="lightgray", dash=(2, 2))
-
-    def draw_skills(self):
-        """Draws all skills as circles with text labels."""
-        font_size = 8
-        self.skill_circles = {}
-        for skill in self.skills:
-            # Draw with no multiplier applied for visual representation in editor
-            x, y = skill['x'], skill['y']
-            radius = self.radius
-            circle = self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill="gray")
-            text = self.canvas.create_text(x, y, text=skill['name'], fill="black", font=("Arial", font_size))
-            self.skill_circles[skill['name']] = (circle, text)
+        if width <= 1:
+            # Not mapped yet
+            width, height = self.size, self.size
+        return (self.view_x, self.view_y, width / self.zoom, height / self.zoom)
+
+    def take_item(self, kind, **options):
+        """A canvas item of kind, reusing a hidden one if there is any."""
+        if self.pools[kind]:
+            item = self.pools[kind].pop()
+            self.canvas.itemconfig(item, state="normal", **options)
+            return item
+        create = getattr(self.canvas, f'create_{kind}')
+        if kind == 'text':
+            return create(0, 0, **options)
+        return create(0, 0, 0, 0, **options)
+
+    def release_item(self, kind, item):
+        self.canvas.itemconfig(item, state="hidden")
+        self.pools[kind].append(item)
+
+    def render_view(self):
+        """
+        Makes sure exactly the grid lines, edges and skills in view have canvas
+        items, at the right place. Items of what went out of view are hidden and
+        reused for what came in, so the number of items stays about the number of
+        things on screen, whatever the size of the tree.
+        """
+        rect = self.viewport()
+        self.render_grid(rect)
+
+        visible_nodes = {index for index in self.spatial_index.query(rect)
+                         if rects_intersect(self.node_rect(self.skills[index]), rect)}
+        visible_edges = {edge for edge in self.edge_index.query(rect)
+                         if segment_intersects_rect(*self.edge_coords(edge), rect)}
+
+        for index in [index for index in self.node_items if index not in visible_nodes]:
+            circle, text = self.node_items.pop(index)
+            self.release_item('oval', circle)
+            if text is not None:
+                self.release_item('text', text)
+        for edge in [edge for edge in self.edge_items if edge not in visible_edges]:
+            self.release_item('line', self.edge_items.pop(edge))
+
+        for edge in visible_edges:
+            self.place_edge(edge)
+        for index in sorted(visible_nodes):
+            self.place_node(index)
+        # Items may have been created (on top) or reused in any order, put the layers back
+        self.canvas.tag_raise("node")
+        self.canvas.tag_raise("label")
+
+    def render_grid(self, rect):
+        """Draws the grid lines in view, skipping some when zoomed out so they stay apart."""
+        step = self.grid_size * max(1, math.ceil(8 / (self.grid_size * self.zoom)))
+        x, y, width, height = rect
+        screen_width, screen_height = width * self.zoom, height * self.zoom
+        lines = []
+        for grid_x in range(math.ceil(x / step) * step, math.floor(x + width) + 1, step):
+            screen_x = (grid_x - self.view_x) * self.zoom
+            lines.append((screen_x, 0, screen_x, screen_height))
+        for grid_y in range(math.ceil(y / step) * step, math.floor(y + height) + 1, step):
+            screen_y = (grid_y - self.view_y) * self.zoom
+            lines.append((0, screen_y, screen_width, screen_y))
+
+        while len(self.grid_items) < len(lines):
+            self.grid_items.append(self.canvas.create_line(0, 0, 0, 0, fill="lightgray", dash=(2, 2), tags="grid"))
+        for item, coords in zip(self.grid_items, lines):
+            self.canvas.coords(item, *coords)
+            self.canvas.itemconfig(item, state="normal")
+        for item in self.grid_items[len(lines):]:
+            self.canvas.itemconfig(item, state="hidden")
+        self.canvas.tag_lower("grid")
+
+    def place_node(self, index):
+        """Gives a skill in view its items, as dot or as labelled circle depending on zoom."""
+        skill = self.skills[index]
+        items = self.node_items.get(index)
+        if items is None:
+            items = [self.take_item('oval', fill=self.node_color(index), tags="node"), None]
+            self.node_items[index] = items
+
+        x, y = self.to_screen(skill['x'], skill['y'])
+        detailed = self.zoom >= self.detail_zoom
+        radius = self.radius * self.zoom if detailed else max(2, self.radius * self.zoom)
+        self.canvas.coords(items[0], x - radius, y - radius, x + radius, y + radius)
+
+        if detailed:
+            font = ("Arial", max(1, round(8 * self.zoom)))
+            if items[1] is None:
+                items[1] = self.take_item('text', text=skill['name'], fill="black", font=font, tags="label")
+            else:
+                self.canvas.itemconfig(items[1], font=font)
+            self.canvas.coords(items[1], x, y)
+        elif items[1] is not None:
+            self.release_item('text', items[1])
+            items[1] = None
+
+    def place_edge(self, edge):
+        line = self.edge_items.get(edge)
+        if line is None:
+            line = self.take_item('line', fill="darkgray", width=2, tags="edge")
+            self.edge_items[edge] = line
+        x1, y1, x2, y2 = self.edge_coords(edge)
+        self.canvas.coords(line, *self.to_screen(x1, y1), *self.to_screen(x2, y2))
+
+    def node_color(self, index):
+        # Light blue for selected nodes
+        return "#66b3ff" if index in self.selected_set else "gray"
+
+    def build_edges(self):
+        """
+        Finds every dependency, and keeps the ones touching each skill so moving
+        one only updates those. Lines are only drawn when in view.
+        """
+        graph = SkillGraph(self.skills)
+        first_index = {}
+        for index, skill in enumerate(self.skills):
+            first_index.setdefault(skill['name'], index)
+
+        self.edges = []  # (child index, parent index)
+        self.edges_of = [[] for _ in self.skills]  # skill index -> indices into self.edges
+        for index, skill in enumerate(self.skills):
+            for parent in graph.dependencies_of(skill):
+                parent_index = first_index[parent['name']]
+                self.edges_of[index].append(len(self.edges))
+                self.edges_of[parent_index].append(len(self.edges))
+                self.edges.append((index, parent_index))
+
+    def edge_coords(self, edge):
+        child, parent = self.edges[edge]
+        return self.skills[child]['x'], self.skills[child]['y'], self.skills[parent]['x'], self.skills[parent]['y']
+
+    def edge_rect(self, edge):
+        x1, y1, x2, y2 = self.edge_coords(edge)
+        return (min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+
+    def build_spatial_index(self):
+        """
+        Buckets the skills and the dependency lines by position, in cells of whole
+        grid squares at least a node wide.
+        """
+        cell_size = self.grid_size * max(1, math.ceil(2 * self.radius / self.grid_size))
+        self.spatial_index = SpatialGrid(cell_size)
+        for index, skill in enumerate(self.skills):
+            self.spatial_index.insert(index, self.node_rect(skill))
+        self.edge_index = SpatialGrid(cell_size)
+        for edge in range(len(self.edges)):
+            self.edge_index.insert(edge, self.edge_rect(edge))
+
+    def node_rect(self, skill):
+        return (skill['x'] - self.radius, skill['y'] - self.radius, 2 * self.radius, 2 * self.radius)
+
+    def skill_at(self, x, y):
+        """Index of the skill under (x, y), in world coordinates, the one drawn on top if they overlap, or None."""
+        hits = [index for index in self.spatial_index.query_point(x, y)
+                if (x - self.skills[index]['x']) ** 2 + (y - self.skills[index]['y']) ** 2 <= self.radius ** 2]
+        return max(hits) if hits else None
+
+    def move_skill(self, index, x, y):
+        """Moves a skill and redraws it and its dependency lines, nothing else."""
+        skill = self.skills[index]
+        self.spatial_index.remove(index, self.node_rect(skill))
+        for edge in self.edges_of[index]:
+            self.edge_index.remove(edge, self.edge_rect(edge))
+        self.file.move(index, x, y)
+        self.spatial_index.insert(index, self.node_rect(skill))
+        for edge in self.edges_of[index]:
+            self.edge_index.insert(edge, self.edge_rect(edge))
+
+        # Whatever comes into or goes out of view is dealt with by the next render_view
+        if index in self.node_items:
+            self.place_node(index)
+        for edge in self.edges_of[index]:
+            if edge in self.edge_items:
+                self.place_edge(edge)
+
+    def set_selection(self, indices):
+        """Selects the skills at indices, recoloring only the ones whose selection changed."""
+        changed = self.selected_set.symmetric_difference(indices)
+        self.selected_skills = list(indices)
+        self.selected_set = set(indices)
+        for index in changed:
+            if index in self.node_items:
+                self.canvas.itemconfig(self.node_items[index][0], fill=self.node_color(index))
+
+    def on_pan_start(self, event):
+        self.pan_start = (event.x, event.y)
+
+    def on_pan(self, event):
+        x0, y0 = self.pan_start
+        self.view_x -= (event.x - x0) / self.zoom
+        self.view_y -= (event.y - y0) / self.zoom
+        self.pan_start = (event.x, event.y)
+        self.render_view()
+
+    def on_zoom(self, event):
+        """Zooms in or out around the mouse pointer."""
+        zoom_in = event.num == 4 or getattr(event, 'delta', 0) > 0
+        world_x, world_y = self.to_world(event.x, event.y)
+        self.zoom = min(8.0, max(0.05, self.zoom * (1.25 if zoom_in else 0.8)))
+        # Keep the point under the pointer where it is
+        self.view_x = world_x - event.x / self.zoom
+        self.view_y = world_y - event.y / self.zoom
+        self.render_view()
 
     def on_click(self, event):
-        """Handles clicking on skills to initiate selection or deselection."""
-        for skill in self.skills:
-            x, y = skill['x'], skill['y']
-            radius = self.radius
-            if (event.x - x) ** 2 + (event.y - y) ** 2 <= radius ** 2:
-                # If Ctrl is pressed, toggle selection
-                if event.state == 0x0004:  # Ctrl is pressed
-                    if skill in self.selected_skills:
-                        self.selected_skills.remove(skill)
-                    else:
-                        self.selected_skills.append(skill)
-                else:
-                    # Select single node without Ctrl
-                    self.selected_skills = [skill]  # Deselect others
-                self.update_selection_visuals()
+        """
+        Handles clicking on skills to initiate selection or deselection. Clicking
+        on empty canvas starts a rubber band selection instead.
+        """
+        ctrl_pressed = event.state == 0x0004
+        index = self.skill_at(*self.to_world(event.x, event.y))
+        if index is None:
+            self.band_start = (event.x, event.y)
+            self.band_additive = ctrl_pressed
+            self.band = self.canvas.create_rectangle(event.x, event.y, event.x, event.y,
+                                                     outline="#3399ff", dash=(4, 2))
+            return
+
+        # If Ctrl is pressed, toggle selection
+        if ctrl_pressed:
+            if index in self.selected_set:
+                self.set_selection([selected for selected in self.selected_skills if selected != index])
+            else:
+                self.set_selection(self.selected_skills + [index])
+        else:
+            # Select single node without Ctrl
+            self.set_selection([index])  # Deselect others
 
     def on_drag(self, event):
-        """Handles dragging of the selected skills."""
+        """Handles dragging of the selected skills, or of the rubber band."""
+        if self.band is not None:
+            x0, y0 = self.band_start
+            self.canvas.coords(self.band, x0, y0, event.x, event.y)
+            return
+
         if len(self.selected_skills) == 1:  # Only allow drag if one node is selected
-            skill = self.selected_skills[0]
-            new_x = self.snap_to_grid(event.x)  # Snap to grid
-            new_y = self.snap_to_grid(event.y)  # Snap to grid
-            skill['x'] = new_x
-            skill['y'] = new_y
+            x, y = self.to_world(event.x, event.y)
+            self.move_skill(self.selected_skills[0], self.snap_to_grid(x), self.snap_to_grid(y))
+
+    def on_release(self, event):
+        """
+        Ends a drag: logs the moves, or selects every skill whose centre is inside
+        the rubber band (added to the selection with Ctrl).
+        """
+        if self.file.unjournaled:
+            self.journal_moves()
+            # The dragged skill's lines may have come into view
+            self.render_view()
+        if self.band is None:
+            return
+        self.canvas.delete(self.band)
+        self.band = None
+
+        x0, y0 = self.to_world(*self.band_start)
+        x1, y1 = self.to_world(event.x, event.y)
+        left, right = min(x0, x1), max(x0, x1)
+        top, bottom = min(y0, y1), max(y0, y1)
+        inside = sorted(index for index in self.spatial_index.query((left, top, right - left, bottom - top))
+                        if left <= self.skills[index]['x'] <= right and top <= self.skills[index]['y'] <= bottom)
 
-            # Update visuals (positions)
-            circle, text = self.skill_circles[skill['name']]
-            self.canvas.coords(circle, new_x - self.radius, new_y - self.radius, new_x + self.radius, new_y + self.radius)
-            self.canvas.coords(text, new_x, new_y)
+        if self.band_additive:
+            self.set_selection(self.selected_skills + [index for index in inside if index not in self.selected_set])
+        else:
+            self.set_selection(inside)
 
     def move_selected_nodes(self, event):
         """Moves all selected nodes based on arrow key pressed."""
@@ -144,50 +376,37 @@ class SkillEditor:
             dy = move_distance
 
         # Move all selected nodes and snap to grid
-        for skill in self.selected_skills:
-            skill['x'] += dx
-            skill['y'] += dy
-
-            # Snap to grid after movement
-            skill['x'] = self.snap_to_grid(skill['x'])
-            skill['y'] = self.snap_to_grid(skill['y'])
-
-            # Update visuals (positions)
-            circle, text = self.skill_circles[skill['name']]
-            self.canvas.coords(circle, skill['x'] - self.radius, skill['y'] - self.radius, skill['x'] + self.radius, skill['y'] + self.radius)
-            self.canvas.coords(text, skill['x'], skill['y'])
+        for index in self.selected_skills:
+            skill = self.skills[index]
+            self.move_skill(index, self.snap_to_grid(skill['x'] + dx), self.snap_to_grid(skill['y'] + dy))
+        self.journal_moves()
+        self.render_view()
 
     def snap_to_grid(self, value):
         """Snaps a coordinate value to the nearest grid multiple."""
         return round(value / self.grid_size) * self.grid_size
 
+    def journal_moves(self):
+        """Logs the skills moved since last time, and (re)starts the autosave timer."""
+        if not self.file.unjournaled:
+            return
+        self.file.write_journal()
+        if self.save_job is not None:
+            self.root.after_cancel(self.save_job)
+        self.save_job = self.root.after(self.save_delay, self.save_skills)
+
     def save_skills(self):
-        """Saves the updated skills with their new positions back to the CSV with multiplier."""
-        with open(self.csv_file, 'w', newline='') as csvfile:
-            fieldnames = ['name', 'x', 'y', 'dependency', 'upper_text', 'lower_text', 'status', 'color', 'complete_inner_text_color', 
-                          'unlocked_outer_text_color', 'background_color', 'locked_color', 'incomplete_inner_text_color', 
-                          'locked_outer_text_color', 'level', 'dependency_color']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for skill in self.skills:
-                write_dict = {}
-                for field in fieldnames:
-                    if field in ['x', 'y']:
-                        write_dict[field] = int(skill[field] * self.multiplier)  # Apply multiplier for saving
-                    else:
-                        write_dict[field] = skill[field]
-                writer.writerow(write_dict)
-
-    def update_selection_visuals(self):
-        """Updates visuals of selected skills (highlighting)."""
-        # First clear all current highlights
-        for circle, text in self.skill_circles.values():
-            self.canvas.itemconfig(circle, fill="gray")
-        
-        # Then highlight selected nodes with a lighter blue for better readability
-        for skill in self.selected_skills:
-            circle, text = self.skill_circles[skill['name']]
-            self.canvas.itemconfig(circle, fill="#66b3ff")  # Light blue for selected nodes
-            self.canvas.itemconfig(text, fill="black")  # Ensure text remains black
+        """Saves the skills with their new positions back to the CSV, see SkillFile.save."""
+        if self.save_job is not None:
+            self.root.after_cancel(self.save_job)
+            self.save_job = None
+        self.file.save()
+
+    def on_close(self):
+        """Saves what's still only in the journal before closing."""
+        if self.file.unsaved():
+            self.save_skills()
+        self.root.destroy()
 
-editor = SkillEditor('test.csv')
\ No newline at end of file
+if __name__ == '__main__':
+    editor = SkillEditor('test.csv')
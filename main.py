@@ -4,15 +4,106 @@ Created on Sat Dec 21 13:45:11 2024
 
 @author: funky
 """
+import argparse
 import datetime
 import drawsvg as dw
 from skilltree.SkillTree import SkillTree
+from skilltree.FragmentCache import FragmentCache
+from skilltree.Instrumentation import Instrumentation
+from skilltree.ProgressOverlay import ProgressOverlay, load_progress
+from skilltree.SkillReader import SkillReader
+from skilltree.SkillRecord import STATUSES
 
-st = SkillTree('test.csv')
+parser = argparse.ArgumentParser(description='Generate an SVG skill tree from a CSV file')
+parser.add_argument('csv_file', nargs='?', default='test.csv')
+parser.add_argument('--cache', default=None,
+                    help='File to keep rendered node/edge fragments in between runs')
+parser.add_argument('--stream', action='store_true',
+                    help='Write the SVG to file while drawing instead of building it in memory (for large trees)')
+parser.add_argument('--outer-text', choices=['chars', 'path'], default='chars',
+                    help="How to write the ring text: one element per character, or one textPath per label")
+parser.add_argument('--shapes', choices=['inline', 'symbol'], default='inline',
+                    help='Draw every node body and star row, or define each distinct one once as a <symbol>')
+parser.add_argument('--edges', choices=['line', 'merged'], default='line',
+                    help='Draw one line per dependency, or all edges of the same color as a single path')
+parser.add_argument('--batch-geometry', action='store_true',
+                    help='Compute the ring text and star positions of all skills at once with NumPy')
+parser.add_argument('--compact', action='store_true',
+                    help='Smaller SVG: CSS classes instead of inline styles, rounded coordinates')
+parser.add_argument('--precision', type=int, default=2, help='Decimals kept for coordinates in --compact mode')
+parser.add_argument('--auto-size', action='store_true',
+                    help='Fit the canvas around the skills instead of a fixed 1600x1600')
+parser.add_argument('--layout', choices=['top-down', 'radial'], default='top-down',
+                    help='How to place skills whose x and y are left empty in the CSV')
+parser.add_argument('--viewport', type=float, nargs=4, default=None, metavar=('X', 'Y', 'WIDTH', 'HEIGHT'),
+                    help='Only draw this part of the tree')
+parser.add_argument('--tiles', type=int, default=None, metavar='TILE_SIZE',
+                    help='Split the tree into square tiles of this size, written as separate SVG files')
+parser.add_argument('--descendants-of', default=None, metavar='NAME',
+                    help='Only draw this skill and the skills depending on it')
+parser.add_argument('--ancestors-of', default=None, metavar='NAME',
+                    help='Only draw this skill and the skills it depends on')
+parser.add_argument('--status', nargs='+', choices=STATUSES, default=None,
+                    help='Only draw skills with one of these statuses')
+parser.add_argument('--min-level', type=int, default=None, help='Only draw skills of at least this level')
+parser.add_argument('--max-level', type=int, default=None, help='Only draw skills of at most this level')
+parser.add_argument('--prefix', default=None, help='Only draw skills whose name starts with this')
+parser.add_argument('--derive-status', action='store_true',
+                    help='Lock or unlock skills depending on whether all their dependencies are completed')
+parser.add_argument('--progress', default=None, metavar='PROGRESS_CSV',
+                    help="Draw a user's progress (name, status, level) over the tree")
+parser.add_argument('--check', action='store_true',
+                    help='Only read through the CSV and report the rows that are not valid')
+parser.add_argument('--profile', nargs='?', const='-', default=None, metavar='JSON_FILE',
+                    help='Print how long each stage took (and optionally write the report as JSON)')
+args = parser.parse_args()
+
+if args.check:
+    reader = SkillReader(args.csv_file)
+    valid = sum(1 for skill in reader)
+    for line, message in reader.errors:
+        print(f'{args.csv_file}, line {line}: {message}')
+    print(f'{valid} of {reader.rows_read} rows are valid')
+    raise SystemExit(1 if reader.errors else 0)
+
+instrumentation = None
+if args.profile:
+    instrumentation = Instrumentation()
+    instrumentation.install()
+
+st = SkillTree(args.csv_file, outer_text_mode=args.outer_text, shape_mode=args.shapes,
+               batch_geometry=args.batch_geometry, compact=args.compact, precision=args.precision,
+               auto_size=args.auto_size, layout=args.layout, derive_status=args.derive_status,
+               edge_mode=args.edges)
+cache = FragmentCache(args.cache) if args.cache else None
+
+indices = None
+filters = dict(descendants_of=args.descendants_of, ancestors_of=args.ancestors_of, status=args.status,
+               min_level=args.min_level, max_level=args.max_level, prefix=args.prefix)
+if any(value is not None for value in filters.values()):
+    indices = st.query(**filters)
+    print(f'Drawing {len(indices)} of {len(st.skills)} skills')
 
 
 # Create the SVG drawing of the skill tree and save it
-drawing = st.render()
 dt = datetime.datetime.now().isoformat().split('.')[0].replace(':','')
-drawing.save_svg(f'diagrams/skills_{dt}.svg')
+output_file = f'diagrams/skills_{dt}.svg'
+if args.tiles:
+    tiles = st.render_tiles(args.tiles, f'diagrams/skills_{dt}_{{col}}_{{row}}.svg', cache=cache)
+    print(f'Wrote {len(tiles)} tiles')
+elif args.progress:
+    ProgressOverlay(st, cache).render_to(output_file, load_progress(args.progress))
+elif args.stream:
+    st.render_to(output_file, cache=cache, viewport=args.viewport, indices=indices)
+else:
+    drawing = st.render(cache=cache, viewport=args.viewport, indices=indices)
+    drawing.save_svg(output_file)
+
+if cache is not None:
+    cache.save()
 
+if instrumentation is not None:
+    instrumentation.uninstall()
+    print(instrumentation.summary())
+    if args.profile != '-':
+        instrumentation.dump(args.profile)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from skilltree.SkillTree import SkillTree
+from skilltree.FragmentCache import FragmentCache
+
+
+class WatchedTree:
+    """
+    One CSV kept rendered in memory. refresh() re-renders it only when the file
+    changed on disk, reusing the fragments of the unchanged nodes and edges.
+    """
+    def __init__(self, csv_file, options, output_file=None):
+        self.csv_file = csv_file
+        self.name = os.path.splitext(os.path.basename(csv_file))[0]
+        self.options = options
+        self.output_file = output_file
+        self.cache = FragmentCache()
+        self.tree = None
+        self.stamp = None
+        # Replaced as a whole so requests never see an SVG and ETag that don't match
+        self.current = None  # (svg bytes, etag)
+
+    def refresh(self):
+        """Returns True if the CSV changed and was rendered again."""
+        try:
+            stat = os.stat(self.csv_file)
+        except FileNotFoundError:
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+
+        start = time.perf_counter()
+        try:
+            tree = SkillTree(self.csv_file, **self.options)
+            if tree.load_errors:
+                line, message = tree.load_errors[0]
+                raise ValueError(f'{len(tree.load_errors)} rows could not be loaded, line {line}: {message}')
+            with StringIO() as f:
+                tree.render_to(f, cache=self.cache)
+                svg = f.getvalue().encode('utf-8')
+        except Exception as e:
+            # Most likely the file was caught half written, keep serving the last good render
+            print(f'{self.csv_file} FAILED: {type(e).__name__}: {e}')
+            return False
+        self.cache.prune()
+
+        self.tree = tree
+        self.current = (svg, '"' + hashlib.sha1(svg).hexdigest() + '"')
+        if self.output_file is not None:
+            tmp_file = self.output_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(svg)
+            os.replace(tmp_file, self.output_file)
+        print(f'{self.csv_file} rendered in {time.perf_counter() - start:.3f}s')
+        return True
+
+
+def watch(trees, interval, stop):
+    """Polls the CSVs every interval seconds until stop is set."""
+    while not stop.wait(interval):
+        for tree in trees.values():
+            tree.refresh()
+
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match header (a list of ETags, or *) matches etag."""
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+class SvgRequestHandler(BaseHTTPRequestHandler):
+    """Serves /<name>.svg for every watched CSV, and the list of them at /."""
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        trees = self.server.trees
+        path = self.path.split('?')[0].strip('/')
+
+        if path == '':
+            body = ''.join(f'/{name}.svg\n' for name in sorted(trees)).encode('utf-8')
+            self.send(200, body, 'text/plain; charset=utf-8', send_body=send_body)
+            return
+
+        name, extension = os.path.splitext(path)
+        tree = trees.get(name)
+        if tree is None or extension != '.svg':
+            self.send(404, b'Not found\n', 'text/plain; charset=utf-8', send_body=send_body)
+            return
+        if tree.current is None:
+            self.send(503, b'Not rendered yet\n', 'text/plain; charset=utf-8', send_body=send_body)
+            return
+
+        svg, etag = tree.current
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send(304, None, etag=etag)
+        else:
+            self.send(200, svg, 'image/svg+xml', etag=etag, send_body=send_body)
+
+    def send(self, status, body, content_type=None, etag=None, send_body=True):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Clients may keep it, but have to check it's still current every time
+            self.send_header('Cache-Control', 'no-cache')
+        if body is not None:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body is not None and send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def serve(csv_files, host='127.0.0.1', port=8000, interval=1.0, output_template=None, quiet=False, **options):
+    """
+    Renders every CSV, then serves them over HTTP while re-rendering the ones
+    that change, until interrupted. options are passed on to SkillTree.
+    """
+    trees = {}
+    for csv_file in csv_files:
+        output_file = None
+        if output_template is not None:
+            output_file = output_template.format(name=os.path.splitext(os.path.basename(csv_file))[0],
+                                                 dir=os.path.dirname(csv_file))
+        tree = WatchedTree(csv_file, options, output_file)
+        if tree.name in trees:
+            print(f'Skipping {csv_file}, another file is already served as /{tree.name}.svg')
+            continue
+        if not os.path.isfile(csv_file):
+            print(f'No CSV file found at {csv_file} yet, it will be rendered once it exists')
+        tree.refresh()
+        trees[tree.name] = tree
+
+    server = ThreadingHTTPServer((host, port), SvgRequestHandler)
+    server.trees = trees
+    server.quiet = quiet
+
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch, args=(trees, interval, stop), daemon=True)
+    watcher.start()
+    print(f'Serving {len(trees)} tree(s) on http://{host}:{server.server_address[1]}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep SVG skill trees rendered as their CSV files change, '
+                                                 'and serve them over HTTP')
+    parser.add_argument('csv_files', nargs='+')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between checks for changed files')
+    parser.add_argument('--output', default=None,
+                        help='Also write every render to this path template ({name} and {dir} as in batch.py)')
+    parser.add_argument('--quiet', action='store_true', help="Don't log every request")
+    parser.add_argument('--outer-text', choices=['chars', 'path'], default='chars')
+    parser.add_argument('--shapes', choices=['inline', 'symbol'], default='inline')
+    parser.add_argument('--batch-geometry', action='store_true')
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--precision', type=int, default=2)
+    parser.add_argument('--auto-size', action='store_true')
+    args = parser.parse_args()
+
+    serve(args.csv_files, args.host, args.port, args.interval, args.output, args.quiet,
+          outer_text_mode=args.outer_text, shape_mode=args.shapes, batch_geometry=args.batch_geometry,
+          compact=args.compact, precision=args.precision, auto_size=args.auto_size)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from functools import lru_cache
+
+
+COLOR_FIELDS = ['color', 'complete_inner_text_color', 'unlocked_outer_text_color', 'background_color',
+                'locked_color', 'incomplete_inner_text_color', 'locked_outer_text_color', 'dependency_color']
+
+UNKNOWN_COLOR = 'pink'  # What colors that aren't in the palette show up as
+
+
+class ColorPalette:
+    """
+    The color names usable in the CSV. Each name is looked up once and the
+    resulting string interned, so every row using a color shares the same
+    string object instead of holding a copy, whichever column it is in.
+
+    Use get_palette to share one palette between all trees with the same
+    background color.
+    """
+    def __init__(self, background_color):
+        self.colors = {'red': '#a82f1b',
+                       'dark-red': '#9a3929',
+                       'bronze': '#cd8032',
+                       'silver': '#d7ded9',
+                       'gold': '#cfa959',
+                       'normal-grey': '#5a5a5b',
+                       'special-grey': '#2b2028',
+                       'white': '#ffffff',
+                       'purple': '#ab274f',
+                       'blue': '#00b9ff',
+                       'dark-blue': '#19aee6',
+                       'green': '#638c4d',
+                       'dark-green': '#526747',
+                       'background': background_color}
+        self.resolved = {}  # name as written in the CSV -> interned color
+
+    def resolve(self, name):
+        color = self.resolved.get(name)
+        if color is None:
+            color = sys.intern(self.colors.get(name, UNKNOWN_COLOR))
+            self.resolved[name] = color
+        return color
+
+    def resolve_row(self, row):
+        """Replaces the color names of a row (dict or SkillRecord) with their colors."""
+        for field in COLOR_FIELDS:
+            row[field] = self.resolve(row[field])
+        return row
+
+
+@lru_cache(maxsize=None)
+def get_palette(background_color):
+    return ColorPalette(background_color)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import drawsvg as dw
+import hashlib
+import re
+
+
+# Presentation attributes that are moved into a CSS class, with the unit they need in CSS
+STYLE_ATTRIBUTES = {'fill': '',
+                    'stroke': '',
+                    'stroke-width': 'px',
+                    'font-size': 'px',
+                    'text-anchor': '',
+                    'alignment-baseline': '',
+                    'dominant-baseline': ''}
+
+# Attributes that can be left out when they're 0, since that's their default
+ZERO_DEFAULTS = {'rect': ['x', 'y'],
+                 'circle': ['cx', 'cy'],
+                 'use': ['x', 'y']}
+
+NUMBER = re.compile(r'-?\d+\.\d+(?:e-?\d+)?')
+
+
+def class_name(css):
+    """Short class name derived from the style itself, so it's the same in every run (and cached fragment)."""
+    return 's' + hashlib.sha1(css.encode('utf-8')).hexdigest()[:5]
+
+
+class CompactSvg:
+    """
+    Sits in front of a drawing, SvgStream or MarkupBuffer and rewrites every
+    element appended to it for a smaller file:
+
+    * fill, stroke, font size and text alignment are replaced by a class, with
+      one rule per distinct style in a <style> block (see stylesheet())
+    * coordinates, angles and path data are rounded to precision decimals
+    * x/y/cx/cy attributes that are 0 (their default) are dropped
+    """
+    def __init__(self, svg, precision=2, styles=None):
+        self.svg = svg
+        self.precision = precision
+        self.styles = styles if styles is not None else {}  # class name -> css declarations
+
+    def wrap(self, svg):
+        """Another CompactSvg in front of svg, sharing the same styles."""
+        return CompactSvg(svg, self.precision, self.styles)
+
+    def append(self, element):
+        self.compact(element)
+        self.svg.append(element)
+
+    def append_def(self, element):
+        self.compact(element)
+        self.svg.append_def(element)
+
+    def stylesheet(self):
+        return '\n'.join(f'.{name}{{{css}}}' for name, css in sorted(self.styles.items()))
+
+    def number(self, value):
+        text = f'{value:.{self.precision}f}'
+        if '.' in text:
+            text = text.rstrip('0').rstrip('.')
+        return '0' if text == '-0' else text
+
+    def round_numbers(self, text):
+        return NUMBER.sub(lambda match: self.number(float(match.group())), text)
+
+    def compact(self, element):
+        if not isinstance(element, dw.DrawingBasicElement):
+            # Raw markup, e.g. cached fragments that were compacted when drawn
+            return
+
+        args = element.args
+        declarations = []
+        for attribute, unit in STYLE_ATTRIBUTES.items():
+            value = args.pop(attribute, None)
+            if value is not None:
+                declarations.append(f'{attribute}:{value}{unit}')
+        if declarations:
+            css = ';'.join(declarations)
+            name = class_name(css)
+            self.styles[name] = css
+            args['class'] = f"{args['class']} {name}" if 'class' in args else name
+
+        for attribute in ZERO_DEFAULTS.get(element.TAG_NAME, []):
+            if args.get(attribute) == 0:
+                del args[attribute]
+
+        for attribute, value in args.items():
+            if isinstance(value, float):
+                args[attribute] = self.number(value)
+            elif attribute in ['transform', 'd'] and isinstance(value, str):
+                args[attribute] = self.round_numbers(value)
+
+        if isinstance(getattr(element, 'start_offset', None), float):
+            element.start_offset = self.number(element.start_offset)
+
+        for child in element.children:
+            self.compact(child)
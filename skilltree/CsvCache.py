@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import sys
+from array import array
+from skilltree.SkillReader import SkillReader
+from skilltree.SkillRecord import FIELDNAMES, INT_FIELDS
+
+
+# Bump this whenever the layout of the compiled file changes
+CACHE_VERSION = 4
+HEADER_SIZE = 512  # The header line is padded to this many bytes, so it can be rewritten in place
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def same_file(a, b):
+    """Whether two os.stat results are of the same, unmodified file."""
+    return (a.st_ino, a.st_mtime_ns, a.st_size) == (b.st_ino, b.st_mtime_ns, b.st_size)
+
+
+class CsvCache:
+    """
+    Compiled, columnar copy of a skills CSV kept next to it (<csv>.skc), so the
+    CSV only has to be parsed again when it changes.
+
+    The file starts with a JSON header line (source mtime, size and hash) that is
+    checked first, then a JSON line with the tables of the text columns and the
+    errors, then the columns as raw arrays. Integer columns are stored as is, text
+    columns as indices into their table of distinct values, which keeps repeated
+    colors and statuses down to a few bytes per row. Nothing in it is executed on
+    load (unlike a pickle), so a compiled file planted next to a CSV can at worst
+    give wrong rows, not run code.
+
+    Rows that aren't valid are left out (see SkillReader). Their errors are kept
+    in the compiled file too, so they are reported on every load until fixed.
+    """
+    def __init__(self, csv_file, cache_file=None, enabled=True):
+        self.csv_file = csv_file
+        self.cache_file = cache_file or csv_file + '.skc'
+        self.enabled = enabled  # When False, always parse the CSV and never write the compiled file
+        self.errors = []  # (line number, message) of the rows left out, after load
+
+    def load(self):
+        """
+        Returns the columns of the CSV as a dict of field -> list, from the compiled
+        file if it is still up to date, otherwise by parsing the CSV (and compiling
+        it for next time). Raises FileNotFoundError if the CSV doesn't exist.
+        """
+        if not self.enabled:
+            return self.parse_csv()
+
+        stat = os.stat(self.csv_file)
+        columns = self.read_compiled(stat)
+        if columns is None:
+            # Hash before parsing: if the CSV gets replaced (e.g. by the editor saving) while it's
+            # being parsed, the columns could be of either version, so nothing is written then
+            sha1 = file_hash(self.csv_file)
+            columns = self.parse_csv()
+            if same_file(stat, os.stat(self.csv_file)):
+                self.write_compiled(stat, sha1, columns)
+        return columns
+
+    def rows(self):
+        """
+        Yields every row as a dict, with x, y and level already converted to int
+        (x and y are None when left empty).
+        """
+        columns = self.load()
+        for values in zip(*[columns[field] for field in FIELDNAMES]):
+            yield dict(zip(FIELDNAMES, values))
+
+    def parse_csv(self):
+        columns = {field: [] for field in FIELDNAMES}
+        reader = SkillReader(self.csv_file)
+        for record in reader:
+            for field in FIELDNAMES:
+                columns[field].append(record[field])
+        self.errors = reader.errors
+        return columns
+
+    def read_compiled(self, stat):
+        try:
+            with open(self.cache_file, 'rb') as f:
+                header = json.loads(f.read(HEADER_SIZE))
+                if header.get('version') != CACHE_VERSION or header.get('byteorder') != sys.byteorder:
+                    return None
+
+                touched = (header['mtime_ns'], header['size']) != (stat.st_mtime_ns, stat.st_size)
+                if touched:
+                    # Touched, but maybe not changed. Only the hash can tell.
+                    if header['size'] != stat.st_size or header['sha1'] != file_hash(self.csv_file):
+                        return None
+
+                body = json.loads(f.readline())
+                columns = {}
+                for field in FIELDNAMES:
+                    values = array('q' if field in INT_FIELDS else 'I')
+                    values.fromfile(f, header['rows'])
+                    if field in INT_FIELDS:
+                        columns[field] = values.tolist()
+                        for i in body['missing'][field]:
+                            columns[field][i] = None
+                    else:
+                        table = body['tables'][field]
+                        columns[field] = [table[i] for i in values]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f'Ignoring unreadable compiled cache {self.cache_file}: {e}')
+            return None
+
+        self.errors = [tuple(error) for error in body['errors']]
+        if touched:
+            # Same contents, so later loads don't have to hash the CSV again
+            header['mtime_ns'] = stat.st_mtime_ns
+            self.write_header(header)
+        return columns
+
+    def write_header(self, header):
+        try:
+            with open(self.cache_file, 'r+b') as f:
+                f.write(self.header_line(header))
+        except OSError as e:
+            print(f'Could not update compiled cache {self.cache_file}: {e}')
+
+    @staticmethod
+    def header_line(header):
+        return json.dumps(header).encode('ascii').ljust(HEADER_SIZE - 1) + b'\n'
+
+    def write_compiled(self, stat, sha1, columns):
+        rows = len(columns['name'])
+        body = {'errors': self.errors, 'missing': {}, 'tables': {}}
+        arrays = []
+        for field in FIELDNAMES:
+            if field in INT_FIELDS:
+                # Arrays can't hold None, keep the rows of empty positions aside
+                values = columns[field]
+                body['missing'][field] = [i for i, value in enumerate(values) if value is None]
+                arrays.append(array('q', [value or 0 for value in values]))
+            else:
+                table = {}
+                arrays.append(array('I', [table.setdefault(value, len(table)) for value in columns[field]]))
+                body['tables'][field] = list(table)
+
+        header = {'version': CACHE_VERSION,
+                  'byteorder': sys.byteorder,
+                  'rows': rows,
+                  'mtime_ns': stat.st_mtime_ns,
+                  'size': stat.st_size,
+                  'sha1': sha1}
+
+        # One per process, batch workers may all compile the same (base) CSV at once
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(self.header_line(header))
+                f.write(json.dumps(body).encode('utf-8') + b'\n')
+                for values in arrays:
+                    values.tofile(f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            # Read-only location or similar, the CSV is still usable without it
+            print(f'Could not write compiled cache {self.cache_file}: {e}')
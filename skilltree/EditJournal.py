@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+
+class EditJournal:
+    """
+    Append-only log of position edits next to a skills CSV (<csv>.journal), one
+    JSON line per move with the row index, name and new x/y in CSV units.
+
+    Writing a line is much cheaper than rewriting the CSV, so edits are logged
+    as they happen and only folded into the CSV every now and then. Positions
+    are absolute, so replaying a line twice does no harm, e.g. if the editor
+    died between writing the CSV and clearing the journal.
+    """
+    def __init__(self, csv_file, journal_file=None):
+        self.journal_file = journal_file or csv_file + '.journal'
+        self.entries = 0  # Lines in the journal, replayed or appended
+
+    def append(self, moves):
+        """Logs moves, a list of (index, name, x, y), and makes sure they're on disk."""
+        if not moves:
+            return
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            for index, name, x, y in moves:
+                f.write(json.dumps({'index': index, 'name': name, 'x': x, 'y': y}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries += len(moves)
+
+    def replay(self, rows):
+        """
+        Applies the logged moves to rows (dicts of a CSV, in CSV units), in
+        order. Returns how many were applied.
+        """
+        try:
+            with open(self.journal_file, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        first_index = {}
+        for index, row in enumerate(rows):
+            first_index.setdefault(row['name'], index)
+
+        applied = 0
+        for number, line in enumerate(lines, 1):
+            try:
+                move = json.loads(line)
+            except ValueError:
+                # Most likely the last line, cut short by a crash
+                print(f'Skipping unreadable line {number} of {self.journal_file}')
+                continue
+
+            index = move['index']
+            if not (0 <= index < len(rows) and rows[index]['name'] == move['name']):
+                # Rows were reordered since, fall back to the name
+                index = first_index.get(move['name'])
+                if index is None:
+                    print(f"Skill {move['name']} from {self.journal_file} no longer exists, skipping it")
+                    continue
+            rows[index]['x'] = move['x']
+            rows[index]['y'] = move['y']
+            applied += 1
+
+        self.entries = len(lines)
+        return applied
+
+    def clear(self):
+        """Drops the journal, once its moves are in the CSV."""
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        self.entries = 0
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import drawsvg as dw
+import hashlib
+import json
+import os
+from io import StringIO
+
+
+# Bump this whenever the way nodes or edges are drawn changes, so stale
+# fragments from an older version are never reused.
+CACHE_VERSION = 1
+
+NODE_FIELDS = ['name', 'x', 'y', 'upper_text', 'lower_text', 'status', 'color',
+               'complete_inner_text_color', 'unlocked_outer_text_color', 'background_color',
+               'locked_color', 'incomplete_inner_text_color', 'locked_outer_text_color', 'level']
+EDGE_FIELDS = ['x', 'y', 'status', 'locked_color', 'dependency_color']
+
+
+def element_markup(element):
+    """Serialises a single drawsvg element on its own, without a Drawing around it."""
+    with StringIO() as f:
+        local = dw.types.LocalContext(dw.types.Context(), element, None)
+        element.write_svg_element({}, lambda obj: False, f, local, False)
+        return f.getvalue()
+
+
+class MarkupBuffer:
+    """
+    Stand-in for a dw.Drawing that turns every appended element straight into
+    markup. Lets a Skill draw into a fragment instead of the whole drawing.
+    """
+    def __init__(self):
+        self.parts = []
+
+    def append(self, element):
+        self.parts.append(element_markup(element))
+
+    def getvalue(self):
+        return '\n'.join(self.parts)
+
+
+class FragmentCache:
+    """
+    Rendered SVG markup of nodes and edges, keyed by a hash of everything that
+    goes into drawing them. Optionally kept on disk between runs.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.fragments = {}
+        self.styles = {}  # CSS classes used by compact fragments, see CompactSvg
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+
+        if self.path is not None:
+            self.load()
+
+    @staticmethod
+    def make_key(kind, *values):
+        digest = hashlib.sha1(repr((CACHE_VERSION, kind) + values).encode('utf-8'))
+        return digest.hexdigest()
+
+    def node_key(self, skill, variant=''):
+        return self.make_key('node', variant, *[skill.get(field) for field in NODE_FIELDS])
+
+    def edge_key(self, skill, dependency_skill, variant=''):
+        return self.make_key('edge', variant,
+                             *[skill.get(field) for field in EDGE_FIELDS],
+                             dependency_skill.get('x'), dependency_skill.get('y'))
+
+    def get(self, key):
+        markup = self.fragments.get(key)
+        if markup is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used.add(key)
+        return markup
+
+    def put(self, key, markup):
+        self.fragments[key] = markup
+        self.used.add(key)
+
+    def fragment(self, key, draw):
+        """
+        Returns the cached markup for key, or calls draw(buffer) to render it
+        into a MarkupBuffer and caches the result.
+        """
+        markup = self.get(key)
+        if markup is None:
+            buffer = MarkupBuffer()
+            draw(buffer)
+            markup = buffer.getvalue()
+            self.put(key, markup)
+        return markup
+
+    def prune(self):
+        """
+        Forgets the fragments not used since the last prune, for a cache that
+        lives as long as the process instead of being saved.
+        """
+        self.fragments = {key: self.fragments[key] for key in self.used if key in self.fragments}
+        self.used = set()
+
+    def clear(self):
+        self.fragments = {}
+        self.styles = {}
+        self.used = set()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            print(f'Fragment cache {self.path} is corrupt, starting with an empty cache')
+            return
+
+        if data.get('version') != CACHE_VERSION:
+            return
+        self.fragments = data.get('fragments', {})
+        self.styles = data.get('styles', {})
+
+    def save(self, path=None):
+        """
+        Writes the fragments used since the cache was loaded to disk, dropping
+        the ones that belong to rows that no longer exist.
+        """
+        path = path or self.path
+        if path is None:
+            print('No path given to save the fragment cache to')
+            return
+
+        fragments = {key: self.fragments[key] for key in self.used if key in self.fragments}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'fragments': fragments, 'styles': self.styles}, f)
+        os.replace(tmp_path, path)
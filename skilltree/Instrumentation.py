@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import drawsvg as dw
+import functools
+import json
+import os
+from time import perf_counter
+from skilltree.FragmentCache import MarkupBuffer
+from skilltree.Skill import Skill
+from skilltree.SkillTree import SkillTree
+from skilltree.SvgStream import SvgStream
+
+
+# Methods whose wall time and number of calls are recorded
+TIMED_METHODS = [(SkillTree, 'load_skills_from_csv'),
+                 (SkillTree, 'render'),
+                 (SkillTree, 'render_to'),
+                 (SkillTree, 'draw_symbols'),
+                 (SkillTree, 'draw_edges'),
+                 (SkillTree, 'draw_nodes'),
+                 (SkillTree, 'compute_geometry'),
+                 (Skill, 'draw_base_shape'),
+                 (Skill, 'write_center_text'),
+                 (Skill, 'write_upper_text'),
+                 (Skill, 'write_lower_text'),
+                 (Skill, 'draw_stars'),
+                 (dw.Drawing, 'save_svg')]
+
+# Everything elements get appended to while rendering
+ELEMENT_SINKS = [dw.Drawing, SvgStream, MarkupBuffer]
+
+
+class Instrumentation:
+    """
+    Opt-in profiling of a render. While installed, it wraps the load, render and
+    Skill.draw_* methods to record wall time and call counts, counts the elements
+    drawn per kind and the bytes written. With a FragmentCache, elements are only
+    counted when a fragment is actually drawn (into its MarkupBuffer); placing
+    the fragment markup in the output is counted as one of the fragments.
+
+    Nothing is wrapped until install() (or entering it as a context manager), so
+    there is no overhead at all when it isn't used:
+
+        with Instrumentation() as instrumentation:
+            SkillTree('test.csv').render_to('out.svg')
+        print(instrumentation.report())
+
+    Sinks are called as sink(name, value) for every timed call (value in seconds)
+    and for every output written ('output_bytes', value in bytes), to feed your
+    own metrics system.
+    """
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.timers = {}    # 'Class.method' -> [calls, seconds]
+        self.elements = {}  # element kind -> count
+        self.fragments = 0  # cached markup placed in the output, see FragmentCache
+        self.output_bytes = 0
+        self.patched = []   # (owner, name, original), to undo install()
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+
+    def install(self):
+        if self.patched:
+            return
+        for owner, name in TIMED_METHODS:
+            self.patch(owner, name, self.timed(owner, name))
+        for owner in ELEMENT_SINKS:
+            self.patch(owner, 'append', self.counted(owner.append))
+        self.patch(SvgStream, 'write', self.written(SvgStream.write))
+        self.patch(dw.Drawing, 'save_svg', self.saved(dw.Drawing.save_svg))
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+
+    def patch(self, owner, name, replacement):
+        self.patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def timed(self, owner, name):
+        original = getattr(owner, name)
+        label = f'{owner.__name__}.{name}'
+        stats = self.timers.setdefault(label, [0, 0.0])
+        sinks = self.sinks
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                seconds = perf_counter() - start
+                stats[0] += 1
+                stats[1] += seconds
+                for sink in sinks:
+                    sink(label, seconds)
+        return wrapper
+
+    def counted(self, original):
+        elements = self.elements
+
+        @functools.wraps(original)
+        def wrapper(sink, element, *args, **kwargs):
+            if isinstance(element, dw.Raw):
+                # Fragment markup, its elements were counted when it was drawn
+                self.fragments += 1
+            else:
+                kind = type(element).__name__
+                elements[kind] = elements.get(kind, 0) + 1
+            return original(sink, element, *args, **kwargs)
+        return wrapper
+
+    def written(self, original):
+        @functools.wraps(original)
+        def wrapper(stream, text):
+            self.record_output(len(text.encode('utf-8')))
+            return original(stream, text)
+        return wrapper
+
+    def saved(self, original):
+        # Wraps the (already timed) save_svg to record the size of the file written
+        @functools.wraps(original)
+        def wrapper(drawing, fname, *args, **kwargs):
+            result = original(drawing, fname, *args, **kwargs)
+            self.record_output(os.path.getsize(fname))
+            return result
+        return wrapper
+
+    def record_output(self, num_bytes):
+        self.output_bytes += num_bytes
+        for sink in self.sinks:
+            sink('output_bytes', num_bytes)
+
+    def report(self):
+        """Everything recorded so far, as a dict that can be dumped to JSON."""
+        return {'timers': {label: {'calls': calls, 'seconds': seconds}
+                           for label, (calls, seconds) in self.timers.items() if calls},
+                'elements': dict(sorted(self.elements.items())),
+                'fragments': self.fragments,
+                'output_bytes': self.output_bytes}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self):
+        """The report as readable text, slowest first."""
+        report = self.report()
+        lines = []
+        for label, stats in sorted(report['timers'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"{label:32s} {stats['calls']:8d} calls {stats['seconds'] * 1000:10.2f} ms")
+        for kind, count in report['elements'].items():
+            lines.append(f'{kind:32s} {count:8d} elements')
+        if report['fragments']:
+            lines.append(f"{'fragments':32s} {report['fragments']:8d} placed")
+        lines.append(f"{'output':32s} {report['output_bytes']:8d} bytes")
+        return '\n'.join(lines)
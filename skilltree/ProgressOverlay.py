@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import drawsvg as dw
+from skilltree.CompactSvg import CompactSvg
+from skilltree.FragmentCache import MarkupBuffer, element_markup
+from skilltree.SkillRecord import progress_error
+from skilltree.SvgStream import SvgStream
+
+
+def load_progress(progress_file):
+    """
+    Reads a user's progress from a CSV with name, status and level columns.
+    Returns name -> (status, level).
+    """
+    progress = {}
+    with open(progress_file, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            level = row.get('level') or 0
+            progress[row['name']] = (row['status'], int(level))
+    return progress
+
+
+class LayerBuffer(MarkupBuffer):
+    """MarkupBuffer that also collects defs, to write them out in a <defs> block of their own."""
+    def __init__(self):
+        super().__init__()
+        self.defs = []
+
+    def append_def(self, element):
+        self.defs.append(element_markup(element))
+
+    def defs_markup(self):
+        if not self.defs:
+            return ''
+        return '<defs>\n' + '\n'.join(self.defs) + '\n</defs>\n'
+
+
+class ProgressOverlay:
+    """
+    Renders a SkillTree once as a shared base, in the state of its CSV, then
+    renders every user's progress as an overlay on top of it. Only the skills
+    whose status or level differ from the base are drawn again, so a user
+    costs about as much as the number of skills they changed.
+
+    The document is written as base edges, changed edges, base nodes, changed
+    nodes: a changed edge covers the base one exactly, and a changed node is
+    drawn whole over the base one, so edges still stay below every node.
+
+        overlay = ProgressOverlay(SkillTree('tree.csv'))
+        for user, progress in progress_by_user.items():
+            overlay.render_to(f'diagrams/{user}.svg', progress)
+    """
+    def __init__(self, tree, cache=None):
+        self.tree = tree
+        self.cache = cache  # Optional FragmentCache for the changed nodes and edges, users share a lot of them
+        self.index = {}  # name -> index of the skill, first one wins like in SkillGraph
+        for index, skill in enumerate(tree.skills):
+            self.index.setdefault(skill.name, index)
+
+        self.render_base()
+
+    def render_base(self):
+        tree = self.tree
+        self.box = tree.canvas_box()
+
+        edges = LayerBuffer()
+        svg = tree.make_sink(edges, self.cache)
+        svg.append(dw.Rectangle(*self.box, fill=tree.background_color))
+        self.symbol_ids = tree.draw_defs(svg)  # The overlays only have to define the ones missing
+        tree.draw_edges(svg, self.cache)
+
+        nodes = LayerBuffer()
+        tree.draw_nodes(tree.fragment_sink(svg, nodes), self.cache)
+
+        self.defs = edges.defs_markup()
+        self.edges = edges.getvalue() + '\n'
+        self.nodes = nodes.getvalue() + '\n'
+        self.styles = svg.styles if tree.compact else None
+
+    def changes(self, progress):
+        """
+        (index, record with the user's status and level) for every skill of
+        progress (name -> (status, level)) that differs from the base.
+        """
+        changed = []
+        for name, (status, level) in progress.items():
+            index = self.index.get(name)
+            if index is None:
+                print(f'No skill called {name} in the tree, ignoring its progress')
+                continue
+            error = progress_error(name, status, level)
+            if error is not None:
+                print(f'{error}, ignoring its progress')
+                continue
+
+            skill = self.tree.skills[index]
+            if (status, level) != (skill.status, skill.level):
+                changed.append((index, skill.replace(status=status, level=level)))
+        changed.sort()
+        return changed
+
+    def render_to(self, output, progress):
+        """
+        Writes the tree with a user's progress (name -> (status, level), see
+        load_progress) applied to output, a path or a file-like object.
+        Skills missing from progress keep the status and level of the base.
+        """
+        tree = self.tree
+        changed = self.changes(progress)
+        x, y, width, height = self.box
+
+        with SvgStream(output, width, height, origin=(x, y)) as stream:
+            svg = stream
+            if tree.compact:
+                # Cached fragments may use classes of other users, which have to be kept with the cache
+                styles = self.cache.styles if self.cache is not None else dict(self.styles)
+                svg = CompactSvg(stream, tree.precision, styles)
+            stream.write(self.defs)
+            if tree.shape_mode == 'symbol':
+                tree.define_symbols(svg, [record for index, record in changed], set(self.symbol_ids))
+
+            stream.write(self.edges)
+            for index, record in changed:
+                # Edges only look different when a skill gets locked or unlocked
+                if (tree.skills[index].status == 'locked') == (record.status == 'locked'):
+                    continue
+                for dependency_skill in tree.graph.dependencies_of(record):
+                    self.draw(svg, tree.draw_edge, record, dependency_skill, key=self.edge_key(record, dependency_skill))
+
+            stream.write(self.nodes)
+            geometry = None
+            if tree.batch_geometry and changed:
+                # Computed from the user's records, their levels decide how many stars there are
+                geometry = tree.compute_geometry([index for index, record in changed],
+                                                 [record for index, record in changed])
+            for index, record in changed:
+                self.draw(svg, tree.draw_node, record, geometry, index, key=self.node_key(record))
+
+            if tree.compact:
+                stream.append_css(svg.stylesheet())
+
+    def node_key(self, record):
+        return self.cache.node_key(record, self.tree.render_variant()) if self.cache is not None else None
+
+    def edge_key(self, record, dependency_skill):
+        if self.cache is None:
+            return None
+        return self.cache.edge_key(record, dependency_skill, self.tree.render_variant())
+
+    def draw(self, svg, draw, *args, key=None):
+        """Calls draw(svg, *args), or reuses its markup from the cache."""
+        if key is None:
+            draw(svg, *args)
+            return
+        fragment = lambda buffer: draw(self.tree.fragment_sink(svg, buffer), *args)
+        svg.append(dw.Raw(self.cache.fragment(key, fragment)))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+
+class Progression:
+    """
+    Derives locked/unlocked from completion: a skill is unlocked once every
+    one of its parents is completed (skills without parents always are), and
+    locked otherwise. Only completed is taken from the records (or statuses).
+
+    recompute() goes over the whole graph in one topological pass. After that,
+    set_completed() only updates the skills depending on the one that changed:
+    a count of completed parents is kept per skill, so none of their other
+    parents need to be looked at. Being unlocked doesn't change anything for
+    a skill's own children, so it never has to go further down than that.
+    """
+    def __init__(self, graph, statuses=None):
+        self.graph = graph
+        statuses = statuses or {}  # name -> status, overriding the one of the record
+        self.completed = {name for name, skill in graph.by_name.items()
+                          if statuses.get(name, skill['status']) == 'completed'}
+        # Can never have all their parents completed: in a cycle, or depending on a skill that doesn't exist
+        self.unreachable = set(graph.cycles) | {name for name, dependency in graph.dangling}
+        self.completed_parents = {}  # name -> number of its parents that are completed
+        self.status = {}
+
+        self.recompute()
+
+    def recompute(self):
+        for name in self.graph.order + self.graph.cycles:
+            self.completed_parents[name] = sum(parent in self.completed for parent in self.graph.parents[name])
+            self.status[name] = self.derive(name)
+
+    def derive(self, name):
+        if name in self.completed:
+            return 'completed'
+        if name not in self.unreachable and self.completed_parents[name] == len(self.graph.parents[name]):
+            return 'unlocked'
+        return 'locked'
+
+    def set_completed(self, name, completed=True):
+        """
+        Marks a skill as completed (or not anymore) and updates the skills that
+        depend on it. Returns name -> new status of every skill that changed.
+        """
+        if name not in self.status:
+            print(f'No skill called {name}, cannot change its completion')
+            return {}
+        if (name in self.completed) == completed:
+            return {}
+
+        if completed:
+            self.completed.add(name)
+        else:
+            self.completed.discard(name)
+
+        changed = {}
+        for skill_name in [name] + self.graph.children[name]:
+            if skill_name != name:
+                self.completed_parents[skill_name] += 1 if completed else -1
+            status = self.derive(skill_name)
+            if status != self.status[skill_name]:
+                self.status[skill_name] = status
+                changed[skill_name] = status
+        return changed
+
+    def apply(self, skills):
+        """Writes the derived statuses into skill records. Skills that aren't completed get level 0."""
+        for skill in skills:
+            status = self.status.get(skill['name'])
+            if status is None:
+                continue
+            skill['status'] = status
+            if status != 'completed':
+                skill['level'] = 0
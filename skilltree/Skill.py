@@ -7,12 +7,65 @@ Created on Sat Dec 21 11:32:18 2024
 
 import drawsvg as dw
 import math
+import re
+from xml.sax.saxutils import escape
+from skilltree.SkillRecord import progress_error
+
+
+# Degrees the shared ring text arcs extend past the half circle on each side
+OUTER_TEXT_PATH_PADDING = 20
+
+
+class TextOnPath(dw.DrawingBasicElement):
+    """
+    A <text> with a single <textPath> inside. dw.Text can do text on a path too,
+    but wraps every label in extra tspans and whitespace.
+    """
+    TAG_NAME = 'text'
+    has_content = True
+
+    def __init__(self, text, path_id, start_offset, **kwargs):
+        super().__init__(**kwargs)
+        self.escaped_text = escape(text)
+        self.path_id = path_id
+        self.start_offset = start_offset
+
+    def write_content(self, id_map, is_duplicate, output_file, lcontext, dry_run):
+        if dry_run:
+            return
+        output_file.write(f'<textPath xlink:href="#{self.path_id}" startOffset="{self.start_offset}">')
+        output_file.write(self.escaped_text)
+        output_file.write('</textPath>')
+
+
+class Symbol(dw.DrawingParentElement):
+    """
+    An SVG <symbol>, drawn around its own (0, 0) and placed with <use x= y=>.
+    Overflow is left visible since the shapes extend into negative coordinates.
+    """
+    TAG_NAME = 'symbol'
+
+    def __init__(self, children=(), **kwargs):
+        kwargs.setdefault('overflow', 'visible')
+        super().__init__(children, **kwargs)
+
+
+def symbol_id(kind, *values):
+    """Builds a readable, valid id out of what a symbol looks like."""
+    parts = [re.sub('[^0-9A-Za-z]', '', str(value)) for value in values]
+    return '-'.join([kind] + parts)
 
 
 class Skill:
     """
     Class to handle the drawing of an SVG for a skill.
     """
+    # Hard coded params, shared by all skills (can still be overridden per instance)
+    outer_radius = 30
+    inner_radius = 22
+    outer_text_size = 8
+    inner_text_size = 12
+
     def __init__(self, svg, name, position):
         self.svg = svg
         self.name = name
@@ -20,32 +73,32 @@ class Skill:
         self.pos_y = position[1]
         self.initialised = False
         
-        # Hard coded params
-        self.outer_radius = 30
-        self.inner_radius = 22
-        self.outer_text_size = 8
-        self.inner_text_size = 12
+        # 'chars' writes the ring text one rotated character at a time,
+        # 'path' writes each label as a single textPath along a shared arc
+        self.outer_text_mode = 'chars'
+        # 'inline' draws the circles and stars of every node, 'symbol' places
+        # shared <symbol>s (see SkillTree.draw_symbols) with <use>
+        self.shape_mode = 'inline'
+        
+        # Precomputed geometry, filled in by SkillGeometry when a whole tree
+        # is laid out at once. Computed per skill when left empty.
+        self.outer_text_anchors = {}  # 'top'/'bottom' -> [(x, y, rotation in degrees), ...]
+        self.star_positions = None    # [(x, y), ...]
         
     
     def initialise(self, info_dict):
         """
         Does some validation of parameters passed, then sets them if fine.
+        info_dict can be a dict or anything indexable by field name, like a
+        SkillRecord, so rows don't need to be copied into a dict first.
+        Raises ValueError, without setting anything, if they aren't valid.
         """
         status = info_dict['status']
         level = info_dict['level']
         
-        allowed_statuses = ['locked', 'unlocked', 'completed']
-        if status not in allowed_statuses:
-            print(f'Status must be one of {allowed_statuses}')
-            return
-        
-        if level < 0:
-            print('Level provided must be a positive integer')
-            return
-        
-        if status in ['locked', 'unlocked'] and level > 0:
-            print('The level of a skill cannot be greater than 0 if it is not completed')
-            return
+        error = progress_error(self.name, status, level)
+        if error is not None:
+            raise ValueError(error)
         
         self.upper_text = info_dict['upper_text']
         self.lower_text = info_dict['lower_text']
@@ -73,21 +126,36 @@ class Skill:
         self.draw_stars()
     
     def draw_base_shape(self):
-        # Draw base circle
+        if self.shape_mode == 'symbol':
+            self.svg.append(dw.Use(self.base_shape_symbol_id(), self.pos_x, self.pos_y))
+            return
+
+        for element in self.base_shape_elements(self.pos_x, self.pos_y):
+            self.svg.append(element)
+
+    def base_shape_color(self):
         if self.status == 'locked':
-            shape_color = self.locked_color
-        else:
-            shape_color = self.color
-        
-        # print(self.status, shape_color)
-        
-        circle = dw.Circle(self.pos_x, self.pos_y, self.outer_radius, fill=shape_color)
-        self.svg.append(circle)
+            return self.locked_color
+        return self.color
+
+    def base_shape_elements(self, x, y):
+        # Draw base circle
+        elements = [dw.Circle(x, y, self.outer_radius, fill=self.base_shape_color())]
         
         # Add center for donut if not completed
         if self.status in ['locked', 'unlocked']:
-            inner_circle = dw.Circle(self.pos_x, self.pos_y, self.inner_radius, fill=self.background_color)
-            self.svg.append(inner_circle)
+            elements.append(dw.Circle(x, y, self.inner_radius, fill=self.background_color))
+        return elements
+
+    def base_shape_symbol_id(self):
+        """Only depends on what the shape looks like, so equal nodes share one symbol."""
+        if self.status in ['locked', 'unlocked']:
+            return symbol_id('skill-donut', self.outer_radius, self.inner_radius,
+                             self.base_shape_color(), self.background_color)
+        return symbol_id('skill-disc', self.outer_radius, self.base_shape_color())
+
+    def base_shape_symbol(self):
+        return Symbol(self.base_shape_elements(0, 0), id=self.base_shape_symbol_id())
     
     def write_center_text(self):
         text = self.name.replace('|', '\n')
@@ -137,30 +205,99 @@ class Skill:
             return
         start_angle = math.radians(position_angle) - (total_angle_needed / 2)  # Start at the top and spread outwards
 
-        for i, char in enumerate(text):
-            # Calculate the angle for each character along the top half
-            angle = start_angle + i * angle_step
-            # Calculate x, y positions for the character along the outer edge
-            x = self.pos_x + (self.outer_radius+self.inner_radius)/2 * .95 * math.cos(angle)
-            y = self.pos_y + (self.outer_radius+self.inner_radius)/2 * .95 * math.sin(angle)
+        if self.outer_text_mode == 'path':
+            self.write_outer_text_path(position, text[::-1] if position == 'bottom' else text,
+                                       text_color, total_angle_needed, angle_step)
+            return
+
+        # Anchors may have been computed for the whole tree at once (see SkillGeometry)
+        anchors = self.outer_text_anchors.get(position)
+        if anchors is None:
+            anchors = []
+            for i in range(num_chars):
+                # Calculate the angle for each character along the top half
+                angle = start_angle + i * angle_step
+                # Calculate x, y positions for the character along the outer edge
+                x = self.pos_x + (self.outer_radius+self.inner_radius)/2 * .95 * math.cos(angle)
+                y = self.pos_y + (self.outer_radius+self.inner_radius)/2 * .95 * math.sin(angle)
 
-            # Calculate the rotation angle for the text (tangent to the circle)
-            if position == 'top':
-                rotation_angle = angle + math.pi / 2  # Rotate by 90 degrees to align text perpendicular to radius
-            elif position == 'bottom':
-                rotation_angle = angle - math.pi / 2
-                y += self.outer_text_size * 0.2
+                # Calculate the rotation angle for the text (tangent to the circle)
+                if position == 'top':
+                    rotation_angle = angle + math.pi / 2  # Rotate by 90 degrees to align text perpendicular to radius
+                elif position == 'bottom':
+                    rotation_angle = angle - math.pi / 2
+                    y += self.outer_text_size * 0.2
+                anchors.append((x, y, math.degrees(rotation_angle)))
 
+        for char, (x, y, rotation) in zip(text, anchors):
             # Add text element at calculated position with rotation and color
-            text = dw.Text(char,
-                           x=x,
-                           y=y,
-                           font_size=self.outer_text_size,
-                           text_anchor="middle", 
-                           alignment_baseline="middle",
-                           transform=f"rotate({math.degrees(rotation_angle)}, {x}, {y})", 
-                           fill=text_color)
-            self.svg.append(text)
+            self.svg.append(dw.Text(char,
+                                    x=x,
+                                    y=y,
+                                    font_size=self.outer_text_size,
+                                    text_anchor="middle", 
+                                    alignment_baseline="middle",
+                                    transform=f"rotate({rotation}, {x}, {y})", 
+                                    fill=text_color))
+
+    def outer_text_radius(self):
+        return (self.outer_radius+self.inner_radius)/2 * .95
+
+    def outer_text_path_id(self, position):
+        return f'skill-ring-{position}-{self.outer_radius}-{self.inner_radius}'
+
+    def outer_text_path(self, position):
+        """
+        Arc around (0, 0) for the upper/lower text to follow, shared by every node
+        with the same radii. It runs left to right (over the top, or under the
+        bottom) and overshoots the half circle by OUTER_TEXT_PATH_PADDING on both
+        ends, so characters right at the 180 degree cap still land on the path.
+        """
+        r = self.outer_text_radius()
+        pad = math.radians(OUTER_TEXT_PATH_PADDING)
+        path = dw.Path(id=self.outer_text_path_id(position))
+        if position == 'top':
+            path.M(-r * math.cos(pad), r * math.sin(pad))
+            path.A(r, r, 0, 1, 1, r * math.cos(pad), r * math.sin(pad))
+        else:
+            path.M(-r * math.cos(pad), -r * math.sin(pad))
+            path.A(r, r, 0, 1, 0, r * math.cos(pad), -r * math.sin(pad))
+        return path
+
+    def write_outer_text_path(self, position, text, text_color, total_angle, angle_step):
+        """
+        Writes a ring label as a single textPath. Character centers end up on the
+        same angles as the per-character layout: textLength spreads the characters
+        angle_step apart, and the start offset puts them where the chars would start.
+        """
+        num_chars = len(text)
+        if num_chars == 0:
+            return
+
+        r = self.outer_text_radius()
+        pad = math.radians(OUTER_TEXT_PATH_PADDING)
+        spread = (num_chars - 1) * angle_step / 2
+        if position == 'top':
+            start_offset = r * (pad + math.pi / 2 - total_angle / 2 + spread)
+            y = self.pos_y
+        else:
+            start_offset = r * (pad + math.pi / 2 + total_angle / 2 - spread)
+            y = self.pos_y + self.outer_text_size * 0.2
+
+        kwargs = {}
+        if angle_step > 0:
+            kwargs['textLength'] = r * angle_step * num_chars
+            kwargs['lengthAdjust'] = 'spacing'
+
+        self.svg.append(TextOnPath(text,
+                                   self.outer_text_path_id(position),
+                                   start_offset,
+                                   font_size=self.outer_text_size,
+                                   text_anchor="middle",
+                                   dominant_baseline="middle",
+                                   transform=f"translate({self.pos_x}, {y})",
+                                   fill=text_color,
+                                   **kwargs))
 
     def write_upper_text(self):
         """
@@ -190,8 +327,16 @@ class Skill:
         The stars will follow the shape of the donut, located above the text.
         Bronze stars for levels 1-4, Silver stars for level 5.
         """
-        star_radius = 3  # Radius of each star
-        star_distance = self.inner_radius * .8 # Trying to get it just inside the donut
+        if self.shape_mode == 'symbol':
+            if self.star_row()[0] > 0:
+                self.svg.append(dw.Use(self.stars_symbol_id(), self.pos_x, self.pos_y))
+            return
+
+        for star in self.star_elements(self.pos_x, self.pos_y):
+            self.svg.append(star)
+
+    def star_row(self):
+        """Returns how many stars to draw and their color."""
         bronze_color = '#cd7f32'
         silver_color = '#c0c0c0'
         gold_color = '#ffd700'
@@ -213,23 +358,40 @@ class Skill:
             color = gold_color
         else:
             print('Something happened in calculating number of stars to draw')
+        return num_stars, color
+
+    def star_elements(self, x, y):
+        star_radius = 3  # Radius of each star
+        star_distance = self.inner_radius * .8 # Trying to get it just inside the donut
+        num_stars, color = self.star_row()
+
+        if self.star_positions is not None and (x, y) == (self.pos_x, self.pos_y):
+            return [dw.Circle(star_x, star_y, star_radius, fill=color) for star_x, star_y in self.star_positions]
         
         angle_separation = 25
         total_angle_span = (num_stars - 1) * angle_separation
         start_angle = math.radians(270) - math.radians(total_angle_span / 2)
         
+        stars = []
         for i in range(num_stars):
                         
             # Calculate the angle for the current star
             angle = start_angle + math.radians(i * angle_separation)
     
             # Calculate the (x, y) position for each star
-            x = self.pos_x + star_distance * math.cos(angle)
-            y = self.pos_y + star_distance * math.sin(angle)
+            star_x = x + star_distance * math.cos(angle)
+            star_y = y + star_distance * math.sin(angle)
             
             # Draw the star, which is actually just a circle
-            star = dw.Circle(x, y, star_radius, fill=color)
-            self.svg.append(star)
+            stars.append(dw.Circle(star_x, star_y, star_radius, fill=color))
+        return stars
+
+    def stars_symbol_id(self):
+        num_stars, color = self.star_row()
+        return symbol_id('skill-stars', self.inner_radius, num_stars, color)
+
+    def stars_symbol(self):
+        return Symbol(self.star_elements(0, 0), id=self.stars_symbol_id())
 
 
 # width, height = 400, 400
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+from skilltree.CsvCache import CsvCache
+from skilltree.EditJournal import EditJournal
+from skilltree.SkillGraph import SkillGraph
+from skilltree.SkillRecord import FIELDNAMES
+from skilltree.TreeLayout import TreeLayout
+
+
+class SkillFile:
+    """
+    The skills CSV as the editor works on it, without any of the UI: loading
+    it (with the moves left in its journal), keeping track of moves, logging
+    them to the journal and saving the CSV back.
+
+    Positions are divided by multiplier on load, so the editor works in its
+    own units; the CSV units of every skill are kept in csv_positions, so the
+    ones that didn't move are saved exactly as they were.
+    """
+    def __init__(self, csv_file, multiplier=2):
+        self.csv_file = csv_file
+        self.multiplier = multiplier
+        self.journal = EditJournal(csv_file)
+        self.skills = []
+        self.csv_positions = []  # (x, y) in CSV units, by skill index
+        self.unjournaled = set()  # Indices of skills moved since the last journal write
+        self.load_errors = []  # (line number, message) of CSV rows that couldn't be loaded
+
+    def load(self):
+        """
+        Load skills from CSV and apply multiplier when reading coordinates.
+        Moves left in the journal by an editor that didn't get to save are
+        applied on top.
+        """
+        self.skills = []
+        self.csv_positions = []
+        try:
+            cache = CsvCache(self.csv_file)
+            rows = list(cache.rows())
+            self.load_errors = cache.errors
+            for line, message in self.load_errors:
+                print(f'{self.csv_file}, line {line}: {message}, skipping it')
+            replayed = self.journal.replay(rows)
+            if replayed:
+                print(f'Recovered {replayed} unsaved moves from {self.journal.journal_file}')
+            if any(row['x'] is None or row['y'] is None for row in rows):
+                # Give unplaced skills a starting position to drag them from
+                TreeLayout(SkillGraph(rows)).place(rows)
+            for row in rows:
+                skill = dict(row)
+                skill['x'] = row['x'] / self.multiplier  # Apply multiplier
+                skill['y'] = row['y'] / self.multiplier  # Apply multiplier
+                self.skills.append(skill)
+                self.csv_positions.append((row['x'], row['y']))
+        except FileNotFoundError:
+            print("No CSV file found, starting with empty skill set.")
+        return self.skills
+
+    def move(self, index, x, y):
+        """Sets the position of a skill, in editor units. It gets journaled on the next write_journal."""
+        skill = self.skills[index]
+        skill['x'] = x
+        skill['y'] = y
+        self.csv_positions[index] = (int(x * self.multiplier), int(y * self.multiplier))
+        self.unjournaled.add(index)
+
+    def unsaved(self):
+        """Whether there are moves that aren't in the CSV yet."""
+        return bool(self.unjournaled or self.journal.entries)
+
+    def write_journal(self):
+        moves = [(index, self.skills[index]['name'], *self.csv_positions[index]) for index in sorted(self.unjournaled)]
+        self.journal.append(moves)
+        self.unjournaled = set()
+
+    def save(self, output_file=None):
+        """
+        Saves the skills with their new positions back to the CSV (or to
+        output_file), then drops the journal. The CSV is written to a temporary
+        file that then replaces it, so a crash midway never leaves a truncated
+        CSV behind. Returns whether it was saved.
+        """
+        self.write_journal()
+        if self.load_errors:
+            # Rows that couldn't be loaded would be lost, the moves stay in the journal until they're fixed
+            print(f'Not saving {self.csv_file}: fix the lines above first, moves are kept in {self.journal.journal_file}')
+            return False
+
+        output_file = output_file or self.csv_file
+        tmp_file = output_file + '.tmp'
+        with open(tmp_file, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            for skill, (x, y) in zip(self.skills, self.csv_positions):
+                write_dict = {field: skill[field] for field in FIELDNAMES}
+                write_dict['x'] = x
+                write_dict['y'] = y
+                writer.writerow(write_dict)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(tmp_file, output_file)
+        if output_file == self.csv_file:
+            self.journal.clear()
+        return True
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class SkillGeometry:
+    """
+    Ring text anchors and star positions for every skill of a tree, computed
+    with NumPy in one pass instead of per character/star inside each Skill.
+    Uses the same layout as Skill.write_outer_text and Skill.star_elements.
+
+    If indices are given, skills are the rows at those indices of the tree,
+    and only they are computed; apply then takes the same indices.
+    """
+    def __init__(self, skills, outer_radius, inner_radius, outer_text_size, indices=None):
+        # index in the tree -> position in the arrays, None when they cover the whole tree
+        self.positions = None if indices is None else {index: position for position, index in enumerate(indices)}
+        self.outer_radius = outer_radius
+        self.inner_radius = inner_radius
+        self.outer_text_size = outer_text_size
+
+        self.pos_x = np.array([skill.get('x', 100) for skill in skills], dtype=float)
+        self.pos_y = np.array([skill.get('y', 100) for skill in skills], dtype=float)
+
+        upper_lengths = np.array([len(skill.get('upper_text') or '') for skill in skills], dtype=int)
+        lower_lengths = np.array([len(skill.get('lower_text') or '') for skill in skills], dtype=int)
+        levels = np.array([skill.get('level') or 0 for skill in skills], dtype=int)
+
+        self.upper = self.ring_anchors(upper_lengths, 'top')
+        self.lower = self.ring_anchors(lower_lengths, 'bottom')
+        self.stars = self.star_anchors(levels)
+
+    @staticmethod
+    def ragged(lengths):
+        """
+        For items of the given lengths laid end to end, returns the offset of each
+        item, and for every element the item it belongs to and its index within it.
+        """
+        offsets = np.zeros(len(lengths) + 1, dtype=int)
+        np.cumsum(lengths, out=offsets[1:])
+        owner = np.repeat(np.arange(len(lengths)), lengths)
+        index = np.arange(offsets[-1]) - offsets[owner]
+        return offsets, owner, index
+
+    def ring_anchors(self, lengths, position):
+        """(offsets, [(x, y, rotation in degrees), ...]) for every character on one ring."""
+        offsets, owner, index = self.ragged(lengths)
+
+        # Same autoscaling as Skill.write_outer_text: 8 degrees per char, max 180
+        num_chars = lengths[owner]
+        total_angle = np.minimum(np.pi, np.radians(8) * num_chars)
+        angle_step = np.where(num_chars > 1, total_angle / np.maximum(num_chars, 1), 0)
+
+        position_angle = np.radians(270 if position == 'top' else 90)
+        angle = position_angle - total_angle / 2 + index * angle_step
+
+        radius = (self.outer_radius + self.inner_radius) / 2 * .95
+        x = self.pos_x[owner] + radius * np.cos(angle)
+        y = self.pos_y[owner] + radius * np.sin(angle)
+
+        if position == 'top':
+            rotation = np.degrees(angle + np.pi / 2)
+        else:
+            rotation = np.degrees(angle - np.pi / 2)
+            y += self.outer_text_size * 0.2
+
+        return offsets, list(zip(x.tolist(), y.tolist(), rotation.tolist()))
+
+    def star_anchors(self, levels):
+        """(offsets, [(x, y), ...]) for every star, same rules as Skill.star_row."""
+        level_to_show = np.clip(levels, 0, 15)
+        num_stars = np.select([level_to_show < 6, level_to_show < 11],
+                              [level_to_show, level_to_show - 5],
+                              level_to_show - 10)
+        offsets, owner, index = self.ragged(num_stars)
+
+        angle_separation = 25
+        total_angle_span = (num_stars[owner] - 1) * angle_separation
+        angle = np.radians(270) - np.radians(total_angle_span / 2) + np.radians(index * angle_separation)
+
+        star_distance = self.inner_radius * .8
+        x = self.pos_x[owner] + star_distance * np.cos(angle)
+        y = self.pos_y[owner] + star_distance * np.sin(angle)
+
+        return offsets, list(zip(x.tolist(), y.tolist()))
+
+    def apply(self, index, skill_instance):
+        """Hands the precomputed geometry of skill number index to its Skill."""
+        if self.positions is not None:
+            index = self.positions[index]
+        for position, (offsets, anchors) in [('top', self.upper), ('bottom', self.lower)]:
+            skill_instance.outer_text_anchors[position] = anchors[offsets[index]:offsets[index + 1]]
+        offsets, anchors = self.stars
+        skill_instance.star_positions = anchors[offsets[index]:offsets[index + 1]]
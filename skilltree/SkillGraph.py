@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+
+
+DEPENDENCY_SEPARATOR = ';'  # Not '|', which is a line break within names
+
+
+class SkillGraph:
+    """
+    Index over the dependencies of a list of skills, built once at load time
+    so that traversals don't need to scan the whole list for every lookup.
+
+    A skill can depend on several others, separated by ';' in the dependency
+    column. '|' can't be used for that, as it is a line break within names.
+    """
+    def __init__(self, skills):
+        self.by_name = {}       # name -> skill record (first one wins on duplicates)
+        self.parents = {}       # name -> list of parent names, empty for roots
+        self.children = {}      # name -> list of child names, in CSV order
+        self.order = []         # names in topological order, parents first
+        self.dangling = []      # (name, dependency) pairs whose dependency doesn't exist
+        self.cycles = []        # names that are part of (or hang below) a cycle
+        # dependency column -> existing parent records, shared by every row with that column
+        self.dependency_parents = {}
+
+        self.build(skills)
+
+    def build(self, skills):
+        for skill in skills:
+            name = skill['name']
+            if name in self.by_name:
+                print(f'Duplicate skill name {name}, only the first one is used')
+                continue
+            self.by_name[name] = skill
+            self.children[name] = []
+
+        for name, skill in self.by_name.items():
+            self.parents[name] = []
+            for dependency in self.split_dependency(skill.get('dependency')):
+                if dependency not in self.by_name:
+                    print(f'Skill {name} depends on {dependency}, which does not exist')
+                    self.dangling.append((name, dependency))
+                elif dependency not in self.parents[name]:
+                    self.parents[name].append(dependency)
+                    self.children[dependency].append(name)
+
+        for skill in skills:
+            self.dependencies_of(skill)
+
+        self.order = self.topological_order()
+
+        if len(self.order) < len(self.by_name):
+            ordered = set(self.order)
+            self.cycles = [name for name in self.by_name if name not in ordered]
+            print(f'Dependency cycle found, these skills are unreachable: {self.cycles}')
+
+    def split_dependency(self, dependency):
+        """
+        Names in a dependency column: the whole column if a skill has that
+        name, otherwise the pieces between ';'.
+        """
+        if not dependency:
+            return []
+        if dependency in self.by_name:
+            return [dependency]
+        return [name for name in dependency.split(DEPENDENCY_SEPARATOR) if name]
+
+    def topological_order(self):
+        """
+        Kahn's algorithm: a skill comes once all of its parents have, starting
+        from the ones without any. Anything not reached is part of a cycle.
+        """
+        order = []
+        waiting = {name: len(parents) for name, parents in self.parents.items()}
+        queue = deque(name for name, count in waiting.items() if count == 0)
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for child in self.children[name]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    queue.append(child)
+        return order
+
+    def dependencies_of(self, skill):
+        """
+        The existing parent records of any row, going by its own dependency
+        column (so duplicate rows get their own edges too). Looked up once per
+        distinct column, so don't modify the list returned.
+        """
+        dependency = skill.get('dependency')
+        parents = self.dependency_parents.get(dependency)
+        if parents is None:
+            parents = []
+            for name in self.split_dependency(dependency):
+                parent = self.by_name.get(name)
+                if parent is not None and parent not in parents:
+                    parents.append(parent)
+            self.dependency_parents[dependency] = parents
+        return parents
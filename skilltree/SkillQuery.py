@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, bisect_right
+
+
+class SkillQuery:
+    """
+    Indexes over a list of skills to pick out a slice of the tree, such as one
+    branch or only the completed skills, in time proportional to the size of
+    the answer rather than to the whole tree. Results are skill indices, in
+    CSV order (which is also the drawing order).
+
+    Branches use an Euler tour: the skills are numbered in depth-first order
+    over a spanning tree of the dependencies (each skill hangs below the one
+    it is first reached from), so everything below a skill is the contiguous
+    range [start, end) of its numbers. Skills with several dependencies also
+    sit below their other parents; those extra edges are kept per parent and
+    followed from the ranges they start in.
+
+    Statuses are bucketed, and levels and names kept sorted, so a filter on
+    either is a lookup or a bisection.
+
+    Going by name, only the first row of a duplicated name is part of the
+    graph, like in SkillGraph.
+    """
+    def __init__(self, skills, graph):
+        self.skills = skills
+        self.graph = graph
+        self.index = {}  # name -> index of its first row
+        for index, skill in enumerate(skills):
+            self.index.setdefault(skill['name'], index)
+
+        self.build_euler_tour()
+
+        self.by_status = {}  # status -> indices, ascending
+        for index, skill in enumerate(skills):
+            self.by_status.setdefault(skill['status'], []).append(index)
+
+        by_level = sorted((skill['level'], index) for index, skill in enumerate(skills))
+        self.levels = [level for level, index in by_level]
+        self.level_indices = [index for level, index in by_level]
+
+        by_name = sorted((skill['name'], index) for index, skill in enumerate(skills))
+        self.names = [name for name, index in by_name]
+        self.name_indices = [index for name, index in by_name]
+
+    def build_euler_tour(self):
+        self.start = {}  # name -> position in the tour
+        self.end = {}    # name -> position after the last skill below it in the spanning tree
+        self.tour = []   # names, by position
+        self.extra_children = {}  # position of a parent -> names depending on it outside the spanning tree
+        tree_parent = {}
+
+        # Roots first, then whatever a cycle kept out of reach of them
+        roots = [name for name in self.graph.by_name if not self.graph.parents[name]]
+        for root in roots + list(self.graph.by_name):
+            if root in self.start:
+                continue
+            tree_parent[root] = None
+            self.start[root] = len(self.tour)
+            self.tour.append(root)
+            stack = [(root, iter(self.graph.children[root]))]
+            while stack:
+                name, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    self.end[name] = len(self.tour)
+                    stack.pop()
+                elif child not in self.start:
+                    tree_parent[child] = name
+                    self.start[child] = len(self.tour)
+                    self.tour.append(child)
+                    stack.append((child, iter(self.graph.children[child])))
+
+        for name, parents in self.graph.parents.items():
+            for parent in parents:
+                if parent != tree_parent[name]:
+                    self.extra_children.setdefault(self.start[parent], []).append(name)
+
+    def indices_of(self, names):
+        return {self.index[name] for name in names}
+
+    def descendants(self, name, include_self=False):
+        """Names of the skills depending on name, directly or not."""
+        if name not in self.start:
+            print(f'No skill called {name}, cannot find what depends on it')
+            return set()
+
+        found = set()  # Tour positions
+        pending = [name]
+        while pending:
+            top = pending.pop()
+            if self.start[top] in found:
+                continue
+            for position in range(self.start[top], self.end[top]):
+                if position in found:
+                    continue
+                found.add(position)
+                pending.extend(self.extra_children.get(position, []))
+
+        names = {self.tour[position] for position in found}
+        if not include_self:
+            # It can only be below itself through a cycle
+            names.discard(name)
+        return names
+
+    def ancestors(self, name, include_self=False):
+        """Names of the skills name depends on, directly or not."""
+        if name not in self.start:
+            print(f'No skill called {name}, cannot find what it depends on')
+            return set()
+
+        names = {name}
+        pending = [name]
+        while pending:
+            for parent in self.graph.parents[pending.pop()]:
+                if parent not in names:
+                    names.add(parent)
+                    pending.append(parent)
+        if not include_self:
+            names.discard(name)
+        return names
+
+    def with_status(self, statuses):
+        """Indices of the skills with any of statuses."""
+        return {index for status in statuses for index in self.by_status.get(status, [])}
+
+    def with_level(self, min_level=None, max_level=None):
+        """Indices of the skills with min_level <= level <= max_level, either bound can be left out."""
+        first = 0 if min_level is None else bisect_left(self.levels, min_level)
+        last = len(self.levels) if max_level is None else bisect_right(self.levels, max_level)
+        return set(self.level_indices[first:last])
+
+    def with_prefix(self, prefix):
+        """Indices of the skills whose name starts with prefix."""
+        indices = set()
+        for position in range(bisect_left(self.names, prefix), len(self.names)):
+            if not self.names[position].startswith(prefix):
+                break
+            indices.add(self.name_indices[position])
+        return indices
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+from skilltree.SkillRecord import FIELDNAMES, INT_FIELDS, POSITION_FIELDS, SkillRecord, progress_error
+
+
+class SkillReader:
+    """
+    Reads a skills CSV one row at a time, yielding a SkillRecord for every
+    valid row. Nothing is read until iterated, and only the current row is
+    held, so a huge file can be validated or consumed as it is read.
+
+    Bad rows (wrong number of columns, a non-integer x/y/level, a status or
+    level that isn't allowed) don't stop the reading: they are skipped and
+    collected in errors as (line number, message), lines counted from 1 with
+    the header.
+
+        reader = SkillReader('tree.csv', get_palette(background_color))
+        for skill in reader:
+            ...
+        for line, message in reader.errors:
+            print(f'tree.csv, line {line}: {message}')
+
+    With a ColorPalette, color names are resolved through it; without one
+    they are yielded as written in the CSV.
+    """
+    def __init__(self, csv_file, palette=None):
+        self.csv_file = csv_file
+        self.palette = palette
+        self.errors = []  # (line number, message) of the rows skipped
+        self.rows_read = 0
+
+    def __iter__(self):
+        self.errors = []
+        self.rows_read = 0
+        with open(self.csv_file, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            missing = [field for field in FIELDNAMES if field not in (reader.fieldnames or [])]
+            if missing:
+                self.errors.append((1, f'Missing columns {missing}'))
+                return
+
+            for row in reader:
+                self.rows_read += 1
+                record = self.validate(row, reader.line_num)
+                if record is not None:
+                    yield record
+
+    def validate(self, row, line):
+        """The row as a SkillRecord, or None (with the reason added to errors) if it isn't valid."""
+        if None in row:
+            self.errors.append((line, 'Too many columns'))
+            return None
+
+        values = []
+        for field in FIELDNAMES:
+            value = row[field]
+            if value is None:
+                self.errors.append((line, 'Too few columns'))
+                return None
+            if field in POSITION_FIELDS and value.strip() == '':
+                value = None
+            elif field in INT_FIELDS:
+                try:
+                    value = int(value)
+                except ValueError:
+                    self.errors.append((line, f'{field} must be an integer, not {value!r}'))
+                    return None
+            values.append(value)
+        record = SkillRecord(*values)
+
+        if not record.name:
+            self.errors.append((line, 'Skill has no name'))
+            return None
+        error = progress_error(record.name, record.status, record.level)
+        if error is not None:
+            self.errors.append((line, error))
+            return None
+
+        record.status = sys.intern(record.status)
+        if self.palette is not None:
+            self.palette.resolve_row(record)
+        return record
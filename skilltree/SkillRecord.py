@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Columns of the skills CSV
+FIELDNAMES = ['name', 'x', 'y', 'dependency', 'upper_text', 'lower_text', 'status', 'color',
+              'complete_inner_text_color', 'unlocked_outer_text_color', 'background_color',
+              'locked_color', 'incomplete_inner_text_color', 'locked_outer_text_color', 'level',
+              'dependency_color']
+INT_FIELDS = ['x', 'y', 'level']
+POSITION_FIELDS = ['x', 'y']  # Can be left empty (None) for TreeLayout to fill in
+
+STATUSES = ['locked', 'unlocked', 'completed']
+
+
+def progress_error(name, status, level):
+    """Why a skill can't have this status and level, or None if it can."""
+    if status not in STATUSES:
+        return f'Status of {name} must be one of {STATUSES}, not {status!r}'
+    if level < 0:
+        return f'Level of {name} must be a positive integer'
+    if status != 'completed' and level > 0:
+        return f'Level of {name} cannot be greater than 0 if it is not completed'
+    return None
+
+
+class SkillRecord:
+    """
+    One row of the skills CSV. Uses __slots__ instead of a dict per row, which
+    is several times smaller when there are 100k+ skills, and can be passed
+    straight to Skill.initialise.
+
+    Still supports skill['name'] and skill.get('x', 100), so code written against
+    the old per-row dicts keeps working.
+    """
+    __slots__ = tuple(FIELDNAMES)
+
+    def __init__(self, *values, **fields):
+        for field, value in zip(FIELDNAMES, values):
+            setattr(self, field, value)
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __setitem__(self, field, value):
+        try:
+            setattr(self, field, value)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __contains__(self, field):
+        return hasattr(self, field)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def replace(self, **fields):
+        """A copy of the record with some fields changed."""
+        record = SkillRecord(*[getattr(self, field) for field in FIELDNAMES])
+        for field, value in fields.items():
+            setattr(record, field, value)
+        return record
+
+    def keys(self):
+        return [field for field in FIELDNAMES if hasattr(self, field)]
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.keys()}
+
+    def __repr__(self):
+        return f'SkillRecord({self.as_dict()})'
@@ -6,112 +6,441 @@ Created on Sat Dec 21 14:04:06 2024
 """
 
 from skilltree.Skill import Skill
+from skilltree.CompactSvg import CompactSvg
+from skilltree.SkillGraph import SkillGraph
+from skilltree.SkillQuery import SkillQuery
+from skilltree.Progression import Progression
+from skilltree.SpatialGrid import SpatialGrid, rects_intersect, segment_intersects_rect
+from skilltree.SvgStream import SvgStream
+from skilltree.TreeLayout import TreeLayout
+from skilltree.CsvCache import CsvCache
+from skilltree.SkillRecord import FIELDNAMES, SkillRecord
+from skilltree.ColorPalette import COLOR_FIELDS, get_palette
 import drawsvg as dw
-import csv
+import math
+import sys
+
+
+EDGE_WIDTH = 15
 
 
 class SkillTree:
-    def __init__(self, skills_file):
+    def __init__(self, skills_file, outer_text_mode='chars', shape_mode='inline', batch_geometry=False,
+                 compiled_cache=True, compact=False, precision=2, auto_size=False,
+                 layout='top-down', derive_status=False, edge_mode='line'):
         self.background_color = '#32324e'
+        self.size = 1600  # Fixed canvas size, unless auto_size
+        self.auto_size = auto_size  # Size the canvas to fit the skills instead
+        self.outer_text_mode = outer_text_mode  # 'chars' or 'path', see Skill.outer_text_mode
+        self.shape_mode = shape_mode  # 'inline' or 'symbol', see Skill.shape_mode
+        self.batch_geometry = batch_geometry  # Compute all ring text/star positions with NumPy up front
+        # 'line' draws one line per dependency, 'merged' one path per edge color
+        self.edge_mode = edge_mode
+        self.compact = compact  # Use CSS classes and rounded numbers for a smaller SVG, see CompactSvg
+        self.precision = precision  # Decimals kept in compact mode
         self.csv_file = skills_file
+        self.compiled_cache = compiled_cache  # Keep a compiled copy of the CSV next to it, see CsvCache
+        self.load_errors = []  # (line number, message) of the rows that couldn't be loaded
         self.skills = self.load_skills_from_csv()
         self.dependency_map = {skill['name']: skill['dependency'] for skill in self.skills}
+        self.graph = SkillGraph(self.skills)
+        self.rows_by_name = {}  # name -> every record with that name, duplicates included
+        for skill in self.skills:
+            self.rows_by_name.setdefault(skill.name, []).append(skill)
+        self.spatial_index = None  # Built on first use, see build_spatial_index
+        self.query_index = None  # Built on first use, see query
+        self.layout = layout  # How to place skills without coordinates, see TreeLayout
+        if any(skill.x is None or skill.y is None for skill in self.skills):
+            self.auto_layout()
+        self.progression = None  # Derives locked/unlocked from completion, see Progression
+        if derive_status:
+            self.progression = Progression(self.graph)
+            self.progression.apply(self.skills)
         
         
     
     def load_skills_from_csv(self):
-        skills = []
-        color_lookup = {'red': '#a82f1b',
-                        'dark-red': '#9a3929',
-                        'bronze': '#cd8032',
-                        'silver': '#d7ded9',
-                        'gold': '#cfa959',
-                        'normal-grey': '#5a5a5b',
-                        'special-grey': '#2b2028',
-                        'white': '#ffffff',
-                        'purple': '#ab274f',
-                        'blue': '#00b9ff',
-                        'dark-blue': '#19aee6',
-                        'green': '#638c4d',
-                        'dark-green': '#526747',
-                        'background': self.background_color}
+        palette = get_palette(self.background_color)
         
+        cache = CsvCache(self.csv_file, enabled=self.compiled_cache)
         try:
-            with open(self.csv_file, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    skill = {
-                        "name": row['name'],
-                        "x": int(row['x']),
-                        "y": int(row['y']),
-                        "dependency": row['dependency'],
-                        "upper_text": row['upper_text'],
-                        "lower_text": row['lower_text'],
-                        "status": row['status'],
-                        "color": color_lookup.get(row['color'], 'pink'),
-                        "complete_inner_text_color": color_lookup.get(row['complete_inner_text_color'], 'pink'),
-                        "unlocked_outer_text_color": color_lookup.get(row['unlocked_outer_text_color'], 'pink'),
-                        "background_color": color_lookup.get(row['background_color'], 'pink'),
-                        "locked_color": color_lookup.get(row['locked_color'], 'pink'),
-                        "incomplete_inner_text_color": color_lookup.get(row['incomplete_inner_text_color'], 'pink'),
-                        "locked_outer_text_color": color_lookup.get(row['locked_outer_text_color'], 'pink'),
-                        "level": int(row['level']),
-                        'dependency_color': color_lookup.get(row['dependency_color'], 'pink')}
-                    skills.append(skill)
+            columns = cache.load()
         except FileNotFoundError:
             print("No CSV file found")
             return
-        return skills
+        self.load_errors = cache.errors
+        for line, message in self.load_errors:
+            print(f'{self.csv_file}, line {line}: {message}, skipping it')
+
+        # Resolve colors column by column, and intern statuses so every row shares the same few strings
+        for field in COLOR_FIELDS:
+            columns[field] = [palette.resolve(color) for color in columns[field]]
+        columns['status'] = [sys.intern(status) for status in columns['status']]
+
+        return [SkillRecord(*values) for values in zip(*[columns[field] for field in FIELDNAMES])]
+
+    def auto_layout(self):
+        """
+        Places the skills that have no x/y in the CSV around the ones that do,
+        on the canvas where there's room. If some of them still end up off the
+        fixed canvas, it's sized to fit the skills instead (see auto_size).
+        """
+        unplaced = [skill for skill in self.skills if skill.x is None or skill.y is None]
+        canvas = None if self.auto_size else (0, 0, self.size, self.size)
+        placed = TreeLayout(self.graph, self.layout).place(self.skills, canvas)
+        if canvas is not None:
+            outside = sum(not TreeLayout.inside((skill.x, skill.y), canvas) for skill in unplaced)
+            if outside:
+                print(f'{outside} placed skills do not fit on the {self.size}x{self.size} canvas, sizing it to fit')
+                self.auto_size = True
+        self.spatial_index = None
+        return placed
+
+    def set_completed(self, name, completed=True):
+        """
+        Marks a skill as completed (or not) and locks/unlocks the skills that
+        depend on it to match. Returns name -> new status of what changed.
+        """
+        if self.progression is None:
+            self.progression = Progression(self.graph)
+            self.progression.apply(self.skills)
+        changed = self.progression.set_completed(name, completed)
+        # Only the records that changed, so this costs as much as the skills depending on name
+        self.progression.apply([skill for changed_name in changed for skill in self.rows_by_name[changed_name]])
+        if changed:
+            self.query_index = None
+        return changed
+
+    def query(self, descendants_of=None, ancestors_of=None, status=None, min_level=None, max_level=None,
+              prefix=None):
+        """
+        Indices (in CSV order) of the skills matching every filter given:
+        descendants_of/ancestors_of a skill name (that skill included, so the
+        branch stays connected), status (one or a list of them), a range of
+        levels and a name prefix. Pass the result to render as indices to
+        draw only that slice of the tree.
+        """
+        if self.query_index is None:
+            self.query_index = SkillQuery(self.skills, self.graph)
+        query = self.query_index
+
+        matches = []
+        if descendants_of is not None:
+            matches.append(query.indices_of(query.descendants(descendants_of, include_self=True)))
+        if ancestors_of is not None:
+            matches.append(query.indices_of(query.ancestors(ancestors_of, include_self=True)))
+        if status is not None:
+            matches.append(query.with_status([status] if isinstance(status, str) else status))
+        if min_level is not None or max_level is not None:
+            matches.append(query.with_level(min_level, max_level))
+        if prefix is not None:
+            matches.append(query.with_prefix(prefix))
+
+        if not matches:
+            return list(range(len(self.skills)))
+        matches.sort(key=len)
+        return sorted(matches[0].intersection(*matches[1:]))
+
+    def render(self, cache=None, viewport=None, indices=None):
+        """
+        Draws the whole tree. If a FragmentCache is passed, nodes and edges whose
+        rows haven't changed since they were last drawn are reused from it.
+        If a viewport (x, y, width, height) is given, only that part of the tree
+        is drawn, and only the nodes and edges that cross it are emitted.
+        If indices are given (e.g. from query), only those skills and the edges
+        between them are drawn.
+        """
+        box = viewport or self.canvas_box(indices)
 
-    def render(self):
         # Create the drawing object
-        size = 1600
-        drawing = dw.Drawing(size, size, origin='top-left')
-        drawing.append(dw.Rectangle(0, 0, size, size, fill=self.background_color))
- 
-        # print(self.skills)
-        
-        # Draw dependencies
-        for skill in self.skills:
-            name = skill['name']
-            x, y = skill.get('x', 100), skill.get('y', 100)  # Default to (100, 100) if not set
-            # print(skill)
-            if skill['status'] == 'locked':
-                dependency_color = skill.get('locked_color', 'grey')
+        drawing = dw.Drawing(box[2], box[3], origin=(box[0], box[1]))
+        svg = self.make_sink(drawing, cache)
+        self.draw_tree(svg, box, cache, *self.drawn(viewport, indices))
+        if self.compact:
+            drawing.append_css(svg.stylesheet())
+        return drawing
+
+    def render_to(self, output, cache=None, viewport=None, indices=None):
+        """
+        Same as render, but streams the SVG straight to output (a path or a
+        file-like object) instead of building the drawing in memory first.
+        Use this for large trees.
+        """
+        box = viewport or self.canvas_box(indices)
+
+        with SvgStream(output, box[2], box[3], origin=(box[0], box[1])) as stream:
+            svg = self.make_sink(stream, cache)
+            self.draw_tree(svg, box, cache, *self.drawn(viewport, indices))
+            if self.compact:
+                # CSS applies to the whole document, wherever the <style> is
+                stream.append_css(svg.stylesheet())
+
+    def render_tiles(self, tile_size, output_template, cache=None):
+        """
+        Splits the canvas into tile_size x tile_size tiles and streams each one
+        that has something in it to output_template.format(col=..., row=...).
+        Returns a list of (col, row, path) of the tiles written.
+        """
+        x0, y0, width, height = self.canvas_box()
+        tiles = []
+        for row in range(math.ceil(height / tile_size)):
+            for col in range(math.ceil(width / tile_size)):
+                tile = (x0 + col * tile_size, y0 + row * tile_size, tile_size, tile_size)
+                node_indices, edge_indices = self.visible(tile)
+                if not node_indices and not edge_indices:
+                    continue
+                path = output_template.format(col=col, row=row)
+                self.render_to(path, cache, viewport=tile)
+                tiles.append((col, row, path))
+        return tiles
+
+    def canvas_box(self, indices=None):
+        """
+        (x, y, width, height) of the canvas: fixed, or fitted around the skills
+        (or the ones at indices) if auto_size.
+        """
+        skills = [skill for index, skill in self.selection(indices)]
+        if not self.auto_size or not skills:
+            return (0, 0, self.size, self.size)
+
+        margin = Skill.outer_radius + 10
+        xs = [skill.x for skill in skills]
+        ys = [skill.y for skill in skills]
+        x0, y0 = min(xs) - margin, min(ys) - margin
+        return (x0, y0, max(xs) + margin - x0, max(ys) + margin - y0)
+
+    def build_spatial_index(self):
+        """
+        Puts every node and edge in a SpatialGrid by bounding box, to find what's
+        inside a viewport without going over the whole tree. Call again after
+        moving skills around.
+        """
+        grid = SpatialGrid(cell_size=8 * Skill.outer_radius)
+        r = Skill.outer_radius
+        for index, skill in enumerate(self.skills):
+            grid.insert(('node', index), (skill.x - r, skill.y - r, 2 * r, 2 * r))
+
+            for dependency_skill in self.graph.dependencies_of(skill):
+                x, y = min(skill.x, dependency_skill.x), min(skill.y, dependency_skill.y)
+                width, height = abs(skill.x - dependency_skill.x), abs(skill.y - dependency_skill.y)
+                pad = EDGE_WIDTH / 2
+                grid.insert(('edge', index), (x - pad, y - pad, width + 2 * pad, height + 2 * pad))
+        self.spatial_index = grid
+        return grid
+
+    def visible(self, viewport):
+        """
+        Indices (in CSV order, which is also the drawing order) of the nodes and
+        of the skills with an edge crossing the viewport (x, y, width, height).
+        """
+        if self.spatial_index is None:
+            self.build_spatial_index()
+
+        r = Skill.outer_radius
+        node_indices, edge_indices = [], []
+        for kind, index in self.spatial_index.query(viewport):
+            skill = self.skills[index]
+            if kind == 'node':
+                if rects_intersect((skill.x - r, skill.y - r, 2 * r, 2 * r), viewport):
+                    node_indices.append(index)
             else:
-                dependency_color = skill.get('dependency_color', '#ffffff')
-            # print(dependency_color)
-            # Draw lines to dependencies
-            dependency = skill.get('dependency', None)
-            if dependency:
-                dependency_skill = next(s for s in self.skills if s['name'] == dependency)
-                dep_x, dep_y = dependency_skill.get('x', 100), dependency_skill.get('y', 100)
-
-                # Draw a line between the skill and its dependency
-                drawing.append(dw.Line(x, y, dep_x, dep_y, stroke=dependency_color, stroke_width=15))
-        
+                if any(segment_intersects_rect(skill.x, skill.y, dependency_skill.x, dependency_skill.y,
+                                               viewport, EDGE_WIDTH / 2)
+                       for dependency_skill in self.graph.dependencies_of(skill)):
+                    edge_indices.append(index)
+        return sorted(node_indices), sorted(edge_indices)
+
+    def drawn(self, viewport=None, indices=None):
+        """
+        (node indices, edge indices, edge targets) to draw for a viewport and/or
+        a subset of the skills, see draw_tree. None everywhere means everything.
+        """
+        node_indices, edge_indices = self.visible(viewport) if viewport else (None, None)
+        if indices is None:
+            return node_indices, edge_indices, None
+
+        if node_indices is None:
+            node_indices = edge_indices = sorted(indices)
+        else:
+            wanted = set(indices)
+            node_indices = [index for index in node_indices if index in wanted]
+            edge_indices = [index for index in edge_indices if index in wanted]
+        # Edges to skills left out would lead nowhere
+        targets = {self.skills[index].name for index in indices}
+        return node_indices, edge_indices, targets
+
+    def selection(self, indices=None):
+        """(index, skill) for the given indices, or for every skill."""
+        if indices is None:
+            return enumerate(self.skills)
+        return ((index, self.skills[index]) for index in indices)
+
+    def make_sink(self, svg, cache=None):
+        """What the tree gets drawn into: svg itself, or a CompactSvg in front of it."""
+        if not self.compact:
+            return svg
+        # Cached fragments refer to classes from earlier runs, so their styles are kept with the cache
+        return CompactSvg(svg, self.precision, cache.styles if cache is not None else None)
+
+    @staticmethod
+    def fragment_sink(svg, buffer):
+        """Fragments have to go through the same rewriting (e.g. CompactSvg) as the rest of svg."""
+        if isinstance(svg, CompactSvg):
+            return svg.wrap(buffer)
+        return buffer
+
+    def draw_tree(self, svg, box, cache=None, node_indices=None, edge_indices=None, edge_targets=None):
+        """
+        Draws the background over box, then the edges, then the nodes into svg.
+        Indices limit what gets drawn to some of the skills, all are drawn if None.
+        """
+        svg.append(dw.Rectangle(box[0], box[1], box[2], box[3], fill=self.background_color))
+        self.draw_defs(svg, node_indices)
+        self.draw_edges(svg, cache, edge_indices, edge_targets)
         # Draw actual skill nodes on top
-        for skill in self.skills:
-            name = skill['name']
-            x, y = skill.get('x', 100), skill.get('y', 100)  # Default to (100, 100) if not set
-            
-            # Create a Skill instance and draw it
-            skill_instance = Skill(drawing, name, [x, y])
-            
-            info_dict = {'upper_text': skill.get('upper_text'),
-                         'lower_text': skill.get('lower_text'),
-                         'status': skill.get('status'),
-                         'color': skill.get('color'),
-                         'complete_inner_text_color': skill.get('complete_inner_text_color'),
-                         'unlocked_outer_text_color': skill.get('unlocked_outer_text_color'),
-                         'background_color': skill.get('background_color'),
-                         'locked_color': skill.get('locked_color'),
-                         'incomplete_inner_text_color': skill.get('incomplete_inner_text_color'),
-                         'locked_outer_text_color': skill.get('locked_outer_text_color'),
-                         'level': skill.get('level')}
-
-            skill_instance.initialise(info_dict)
-            skill_instance.draw()
+        self.draw_nodes(svg, cache, node_indices)
 
-        return drawing
-           
\ No newline at end of file
+    def draw_defs(self, svg, node_indices=None):
+        """
+        Defines the ring text arcs and symbols the nodes refer to, depending on
+        the modes. Returns the ids of the symbols defined.
+        """
+        if self.outer_text_mode == 'path':
+            # Every node has the same radii, so one arc per ring position is shared by all of them
+            template = Skill(svg, None, [0, 0])
+            for position in ['top', 'bottom']:
+                svg.append_def(template.outer_text_path(position))
+
+        if self.shape_mode == 'symbol':
+            return self.draw_symbols(svg, node_indices)
+        return set()
+
+    def draw_edges(self, svg, cache=None, indices=None, targets=None):
+        """
+        Draws the lines between every skill (or the ones at indices) and its
+        dependencies (only the ones named in targets, if given).
+        """
+        if self.edge_mode == 'merged':
+            self.draw_merged_edges(svg, indices, targets)
+            return
+
+        for index, skill in self.selection(indices):
+            # Dangling dependencies are left out, they were reported when the graph was built
+            for dependency_skill in self.dependencies_within(skill, targets):
+                if cache is None:
+                    self.draw_edge(svg, skill, dependency_skill)
+                else:
+                    key = cache.edge_key(skill, dependency_skill, self.render_variant())
+                    draw = lambda buffer: self.draw_edge(self.fragment_sink(svg, buffer), skill, dependency_skill)
+                    svg.append(dw.Raw(cache.fragment(key, draw)))
+
+    def draw_nodes(self, svg, cache=None, indices=None):
+        """Draws every skill node, or the ones at indices."""
+        # Only for what gets drawn, so a tile or a query slice doesn't pay for the whole tree
+        geometry = self.compute_geometry(indices) if self.batch_geometry else None
+
+        for index, skill in self.selection(indices):
+            if cache is None:
+                self.draw_node(svg, skill, geometry, index)
+            else:
+                key = cache.node_key(skill, self.render_variant())
+                draw = lambda buffer: self.draw_node(self.fragment_sink(svg, buffer), skill, geometry, index)
+                svg.append(dw.Raw(cache.fragment(key, draw)))
+
+    def dependencies_within(self, skill, targets=None):
+        dependencies = self.graph.dependencies_of(skill)
+        if targets is None:
+            return dependencies
+        return [dependency_skill for dependency_skill in dependencies if dependency_skill.name in targets]
+
+    def draw_merged_edges(self, svg, indices=None, targets=None):
+        """
+        Draws all edges of the same color as a single path, one M...L subpath
+        per edge, instead of an element each. Colors come in the order they
+        first appear. Each path is cheap to build, so these aren't cached.
+        """
+        subpaths = {}  # color -> ['Mx,y Lx,y', ...]
+        for index, skill in self.selection(indices):
+            for dependency_skill in self.dependencies_within(skill, targets):
+                subpaths.setdefault(self.edge_color(skill), []).append(
+                    f'M{skill.x},{skill.y} L{dependency_skill.x},{dependency_skill.y}')
+
+        for color, parts in subpaths.items():
+            svg.append(dw.Path(d=' '.join(parts), stroke=color, stroke_width=EDGE_WIDTH))
+
+    @staticmethod
+    def edge_color(skill):
+        if skill.status == 'locked':
+            return skill.locked_color
+        return skill.dependency_color
+
+    def draw_edge(self, svg, skill, dependency_skill):
+        """Draws the line between a skill and its dependency."""
+        # Draw a line between the skill and its dependency
+        svg.append(dw.Line(skill.x, skill.y, dependency_skill.x, dependency_skill.y,
+                           stroke=self.edge_color(skill), stroke_width=EDGE_WIDTH))
+
+    def render_variant(self):
+        """Everything besides the rows that changes what a node looks like."""
+        variant = f'{self.outer_text_mode}-{self.shape_mode}'
+        if self.compact:
+            variant += f'-compact{self.precision}'
+        return variant
+
+    def draw_symbols(self, svg, indices=None):
+        """
+        Defines one <symbol> per distinct node body and star row up front, so
+        nodes (cached or not, streamed or not) only need to place them.
+        """
+        return self.define_symbols(svg, (skill for index, skill in self.selection(indices)))
+
+    def define_symbols(self, svg, skills, defined=None):
+        """
+        Appends the symbols the skills (any records) need that aren't in defined
+        yet. Returns the ids of everything defined so far.
+        """
+        defined = set() if defined is None else defined
+        for skill in skills:
+            skill_instance = self.make_skill(svg, skill)
+
+            symbol_id = skill_instance.base_shape_symbol_id()
+            if symbol_id not in defined:
+                svg.append_def(skill_instance.base_shape_symbol())
+                defined.add(symbol_id)
+
+            if skill_instance.star_row()[0] > 0:
+                symbol_id = skill_instance.stars_symbol_id()
+                if symbol_id not in defined:
+                    svg.append_def(skill_instance.stars_symbol())
+                    defined.add(symbol_id)
+        return defined
+
+    def compute_geometry(self, indices=None, records=None):
+        """
+        Ring text anchors and star positions of all skills, or only of the ones
+        at indices (drawn as records instead of their rows, if given), see
+        SkillGeometry.
+        """
+        from skilltree.SkillGeometry import SkillGeometry  # Needs NumPy, only imported when used
+        if indices is None:
+            skills = self.skills
+        elif records is None:
+            skills = [self.skills[index] for index in indices]
+        else:
+            skills = records
+        return SkillGeometry(skills, Skill.outer_radius, Skill.inner_radius, Skill.outer_text_size, indices)
+
+    def draw_node(self, svg, skill, geometry=None, index=None):
+        """Draws a single skill node, using precomputed geometry if given."""
+        skill_instance = self.make_skill(svg, skill)
+        if geometry is not None:
+            geometry.apply(index, skill_instance)
+        skill_instance.draw()
+
+    def make_skill(self, svg, skill):
+        """Creates an initialised Skill for a record, ready to draw into svg."""
+        skill_instance = Skill(svg, skill.name, [skill.x, skill.y])
+        skill_instance.outer_text_mode = self.outer_text_mode
+        skill_instance.shape_mode = self.shape_mode
+        skill_instance.initialise(skill)
+        return skill_instance
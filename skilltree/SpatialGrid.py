@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+
+def rects_intersect(a, b):
+    """a and b are (x, y, width, height) rectangles."""
+    return a[0] <= b[0] + b[2] and b[0] <= a[0] + a[2] and a[1] <= b[1] + b[3] and b[1] <= a[1] + a[3]
+
+
+def segment_intersects_rect(x1, y1, x2, y2, rect, padding=0):
+    """
+    Whether the segment from (x1, y1) to (x2, y2), thickened by padding, crosses
+    rect. Clips the segment against the (padded) rectangle, Liang-Barsky style.
+    """
+    left, top = rect[0] - padding, rect[1] - padding
+    right, bottom = rect[0] + rect[2] + padding, rect[1] + rect[3] + padding
+    dx, dy = x2 - x1, y2 - y1
+    t0, t1 = 0.0, 1.0
+    for p, q in [(-dx, x1 - left), (dx, right - x1), (-dy, y1 - top), (dy, bottom - y1)]:
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
+
+
+class SpatialGrid:
+    """
+    Uniform grid of buckets of cell_size x cell_size. Items are added with their
+    bounding box and put in every cell it overlaps, so a query only has to look
+    at the cells a rectangle covers instead of every item.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (col, row) -> list of items
+
+    def cell_range(self, rect):
+        x, y, width, height = rect
+        cols = range(math.floor(x / self.cell_size), math.floor((x + width) / self.cell_size) + 1)
+        rows = range(math.floor(y / self.cell_size), math.floor((y + height) / self.cell_size) + 1)
+        return cols, rows
+
+    def insert(self, item, rect):
+        cols, rows = self.cell_range(rect)
+        for col in cols:
+            for row in rows:
+                self.cells.setdefault((col, row), []).append(item)
+
+    def remove(self, item, rect):
+        """rect has to be the one item was inserted with."""
+        cols, rows = self.cell_range(rect)
+        for col in cols:
+            for row in rows:
+                bucket = self.cells.get((col, row))
+                if bucket is None or item not in bucket:
+                    continue
+                bucket.remove(item)
+                if not bucket:
+                    del self.cells[(col, row)]
+
+    def query_point(self, x, y):
+        """Every item whose bounding box may contain (x, y), from a single cell."""
+        return list(self.cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)), ()))
+
+    def query_near(self, x, y):
+        """
+        Every item in the cell of (x, y) and the 8 around it, which includes any
+        point within cell_size of it. Items are repeated if they span several cells.
+        """
+        col, row = math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+        cells = self.cells
+        return [item for c in (col - 1, col, col + 1) for r in (row - 1, row, row + 1)
+                for item in cells.get((c, r), ())]
+
+    def query(self, rect):
+        """Every item whose bounding box may overlap rect (check exactly if it matters)."""
+        found = set()
+        cols, rows = self.cell_range(rect)
+        if len(cols) * len(rows) > len(self.cells):
+            # Rectangle is bigger than the populated area, cheaper to go over the buckets
+            for (col, row), bucket in self.cells.items():
+                if col in cols and row in rows:
+                    found.update(bucket)
+            return found
+        for col in cols:
+            for row in rows:
+                found.update(self.cells.get((col, row), ()))
+        return found
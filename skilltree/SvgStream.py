@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from drawsvg.drawing import XML_HEADER, SVG_START, SVG_END, SVG_CSS_FMT
+from drawsvg.elements import escape_cdata
+from skilltree.FragmentCache import element_markup
+
+
+class SvgStream:
+    """
+    Drop-in for a dw.Drawing that writes every element to the output as soon
+    as it's appended, so nothing is kept in memory. Elements come out in the
+    order they're appended, the same as Drawing.save_svg would write them.
+    """
+    def __init__(self, output, width, height, origin=(0, 0)):
+        # output is either a path or anything with a write() method
+        if hasattr(output, 'write'):
+            self.file = output
+            self.owns_file = False
+        else:
+            self.file = open(output, 'w', encoding='utf-8')
+            self.owns_file = True
+        self.width = width
+        self.height = height
+        self.closed = False
+
+        self.write(XML_HEADER)
+        self.write(SVG_START)
+        self.write(f' width="{width}" height="{height}" viewBox="{origin[0]} {origin[1]} {width} {height}">\n')
+        self.write('<defs>\n</defs>\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, text):
+        self.file.write(text)
+
+    def append(self, element):
+        self.write(element_markup(element))
+        self.write('\n')
+
+    def append_def(self, element):
+        """Defs can't be collected up front when streaming, so each one gets its own block."""
+        self.write('<defs>\n')
+        self.write(element_markup(element))
+        self.write('\n</defs>\n')
+
+    def append_css(self, css_text):
+        self.write(SVG_CSS_FMT.format(escape_cdata(css_text)))
+        self.write('\n')
+
+    def close(self):
+        if self.closed:
+            return
+        self.write(SVG_END)
+        self.closed = True
+        if self.owns_file:
+            self.file.close()
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+import math
+from skilltree.Skill import Skill
+from skilltree.SpatialGrid import SpatialGrid, rects_intersect
+
+
+class TreeLayout:
+    """
+    Positions for the skills of a SkillGraph, with Buchheim's linear-time
+    version of Walker's tidy tree algorithm: every subtree is drawn the same
+    wherever it is, parents are centred over their children, and siblings
+    are packed as tightly as node_distance allows.
+
+    All roots hang below a virtual root, so a forest is laid out side by side.
+    mode is 'top-down' (one row per level) or 'radial' (one ring per level,
+    around the root if there is only one).
+
+    Skills that already have coordinates are pinned: they are left where they
+    are, and the skills below them are placed relative to them, moved to the
+    closest free spot where they would land on a skill already there.
+    """
+    def __init__(self, graph, mode='top-down', node_distance=None, level_distance=None):
+        if mode not in ('top-down', 'radial'):
+            raise ValueError(f"Unknown layout mode {mode}, expected 'top-down' or 'radial'")
+        self.graph = graph
+        self.mode = mode
+        # Nodes are 2 * outer_radius wide, leave one more radius between them
+        self.node_distance = node_distance or 3 * Skill.outer_radius
+        self.level_distance = level_distance or 4 * Skill.outer_radius
+        # How close place() lets a skill get to one already there, nodes just don't touch
+        self.clearance = 2 * Skill.outer_radius + 10
+        # Spots place() tries around a taken one, closest first, every clearance / 2
+        self.search_radius = 6 * self.node_distance
+        self.search_offsets = sorted(self.grid_offsets(self.clearance // 2, self.search_radius),
+                                     key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+
+        self.build()
+
+    @staticmethod
+    def grid_offsets(step, radius):
+        """(dx, dy) of the points of a grid of step that are at most radius from (0, 0)."""
+        reach = radius // step
+        return [(i * step, j * step) for i in range(-reach, reach + 1) for j in range(-reach, reach + 1)
+                if (i * step) ** 2 + (j * step) ** 2 <= radius ** 2]
+
+    def build(self):
+        """Numbers the nodes, 0 being the virtual root, and links them up."""
+        graph = self.graph
+        reached = set(graph.order)
+        # Skills caught in a cycle have no way up to a root, give them one
+        self.names = [None] + graph.order + [name for name in graph.by_name if name not in reached]
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        n = len(self.names)
+        self.parent = [-1] * n
+        self.children = [[] for _ in range(n)]
+        for i, name in enumerate(self.names[1:], 1):
+            if name in reached and graph.parents[name]:
+                continue
+            self.parent[i] = 0
+            self.children[0].append(i)
+            if name in reached:
+                self.add_children(i)
+
+        self.number = [0] * n  # 1-based position among its siblings
+        for children in self.children:
+            for position, child in enumerate(children, 1):
+                self.number[child] = position
+
+    def add_children(self, root):
+        stack = [root]
+        while stack:
+            v = stack.pop()
+            name = self.names[v]
+            # A skill with several parents is placed below the first one
+            self.children[v] = [self.index[child] for child in self.graph.children[name]
+                                if self.graph.parents[child][0] == name]
+            for w in self.children[v]:
+                self.parent[w] = v
+            stack.extend(self.children[v])
+
+    def left_brother(self, v):
+        if self.number[v] > 1:
+            return self.children[self.parent[v]][self.number[v] - 2]
+        return -1
+
+    def next_left(self, v):
+        return self.children[v][0] if self.children[v] else self.thread[v]
+
+    def next_right(self, v):
+        return self.children[v][-1] if self.children[v] else self.thread[v]
+
+    def tidy(self):
+        """
+        Runs the two walks of the algorithm. Returns the x of every node, in
+        units of the layout, and its depth (the virtual root being 0).
+        """
+        n = len(self.names)
+        self.prelim = [0.0] * n
+        self.mod = [0.0] * n
+        self.thread = [-1] * n
+        self.ancestor = list(range(n))
+        self.change = [0.0] * n
+        self.shift = [0.0] * n
+
+        self.first_walk()
+
+        # Second walk, pre-order so nodes of the same depth come out left to right
+        x = [0.0] * n
+        depth = [0] * n
+        self.preorder = []
+        stack = [(0, 0.0, 0)]
+        while stack:
+            v, m, d = stack.pop()
+            x[v] = self.prelim[v] + m
+            depth[v] = d
+            self.preorder.append(v)
+            for w in reversed(self.children[v]):
+                stack.append((w, m + self.mod[v], d + 1))
+        return x, depth
+
+    def first_walk(self):
+        """
+        Post-order walk placing every subtree relative to its parent. Done with
+        an explicit stack, generated trees can be deeper than the recursion limit.
+        """
+        children = self.children
+        # [node, index of the next child to walk, default ancestor]
+        stack = [[0, 0, children[0][0] if children[0] else -1]]
+        while stack:
+            frame = stack[-1]
+            v, i, default_ancestor = frame
+            kids = children[v]
+            if i > 0:
+                # kids[i - 1] was just walked, push it clear of its left siblings
+                frame[2] = self.apportion(kids[i - 1], default_ancestor)
+            if i < len(kids):
+                frame[1] = i + 1
+                w = kids[i]
+                stack.append([w, 0, children[w][0] if children[w] else -1])
+                continue
+            stack.pop()
+
+            w = self.left_brother(v)
+            if not kids:
+                self.prelim[v] = self.prelim[w] + self.node_distance if w >= 0 else 0.0
+                continue
+            self.execute_shifts(v)
+            midpoint = (self.prelim[kids[0]] + self.prelim[kids[-1]]) / 2
+            if w >= 0:
+                self.prelim[v] = self.prelim[w] + self.node_distance
+                self.mod[v] = self.prelim[v] - midpoint
+            else:
+                self.prelim[v] = midpoint
+
+    def apportion(self, v, default_ancestor):
+        """
+        Walks down the right contour of the left siblings of v and the left
+        contour of v side by side, moving v right wherever they get too close.
+        """
+        w = self.left_brother(v)
+        if w < 0:
+            return default_ancestor
+        prelim, mod = self.prelim, self.mod
+
+        v_in_right = v_out_right = v
+        v_in_left = w
+        v_out_left = self.children[self.parent[v]][0]
+        s_in_right = s_out_right = mod[v]
+        s_in_left = mod[v_in_left]
+        s_out_left = mod[v_out_left]
+
+        next_right = self.next_right(v_in_left)
+        next_left = self.next_left(v_in_right)
+        while next_right >= 0 and next_left >= 0:
+            v_in_left = next_right
+            v_in_right = next_left
+            v_out_left = self.next_left(v_out_left)
+            v_out_right = self.next_right(v_out_right)
+            self.ancestor[v_out_right] = v
+            shift = (prelim[v_in_left] + s_in_left) - (prelim[v_in_right] + s_in_right) + self.node_distance
+            if shift > 0:
+                ancestor = self.ancestor[v_in_left]
+                if self.parent[ancestor] != self.parent[v]:
+                    ancestor = default_ancestor
+                self.move_subtree(ancestor, v, shift)
+                s_in_right += shift
+                s_out_right += shift
+            s_in_left += mod[v_in_left]
+            s_in_right += mod[v_in_right]
+            s_out_left += mod[v_out_left]
+            s_out_right += mod[v_out_right]
+            next_right = self.next_right(v_in_left)
+            next_left = self.next_left(v_in_right)
+
+        if next_right >= 0 and self.next_right(v_out_right) < 0:
+            self.thread[v_out_right] = next_right
+            mod[v_out_right] += s_in_left - s_out_right
+        else:
+            if next_left >= 0 and self.next_left(v_out_left) < 0:
+                self.thread[v_out_left] = next_left
+                mod[v_out_left] += s_in_right - s_out_left
+            default_ancestor = v
+        return default_ancestor
+
+    def move_subtree(self, left, right, shift):
+        # Spread the shift over the subtrees in between, see execute_shifts
+        subtrees = self.number[right] - self.number[left]
+        self.change[right] -= shift / subtrees
+        self.shift[right] += shift
+        self.change[left] += shift / subtrees
+        self.prelim[right] += shift
+        self.mod[right] += shift
+
+    def execute_shifts(self, v):
+        shift = change = 0.0
+        for w in reversed(self.children[v]):
+            self.prelim[w] += shift
+            self.mod[w] += shift
+            change += self.change[w]
+            shift += self.shift[w] + change
+
+    def positions(self):
+        """Returns name -> (x, y) for every skill, in the coordinates of the layout."""
+        x, depth = self.tidy()
+        if self.mode == 'radial':
+            return self.radial_positions(x, depth)
+        return {self.names[v]: (x[v], (depth[v] - 1) * self.level_distance)
+                for v in range(1, len(self.names))}
+
+    def radial_positions(self, x, depth):
+        """
+        Wraps the tidy layout around a circle: x becomes the angle and depth the
+        ring. Each ring is pushed out until its closest neighbours are at least
+        node_distance apart.
+        """
+        single_root = len(self.children[0]) == 1
+        if single_root:
+            # Put the only root in the centre instead of on a ring of its own
+            depth = [d - 1 for d in depth]
+
+        ringed = [v for v in self.preorder if v > 0 and depth[v] > 0]
+        if not ringed:
+            return {self.names[v]: (0.0, 0.0) for v in range(1, len(self.names))}
+        x_min = min(x[v] for v in ringed)
+        span = max(x[v] for v in ringed) - x_min + self.node_distance
+        angle = {v: 2 * math.pi * (x[v] - x_min) / span - math.pi / 2 for v in ringed}
+
+        rings = {}
+        for v in ringed:  # Pre-order, so every ring is sorted by angle
+            rings.setdefault(depth[v], []).append(angle[v])
+        radius = {0: 0.0}
+        for ring in range(1, max(rings) + 1):
+            angles = rings.get(ring, [])
+            gaps = [b - a for a, b in zip(angles, angles[1:])]
+            if len(angles) > 1:
+                gaps.append(angles[0] + 2 * math.pi - angles[-1])
+            # Chord between the closest two nodes has to be at least node_distance
+            needed = max([self.node_distance / (2 * math.sin(gap / 2)) for gap in gaps if 0 < gap < math.pi],
+                         default=0.0)
+            radius[ring] = max(radius[ring - 1] + self.level_distance, needed)
+
+        positions = {}
+        for v in range(1, len(self.names)):
+            r = radius[depth[v]]
+            a = angle.get(v, 0.0)
+            positions[self.names[v]] = (r * math.cos(a), r * math.sin(a))
+        return positions
+
+    def place(self, skills, bounds=None):
+        """
+        Fills in x and y of the skills missing either of them, in place, and
+        returns how many were placed. A skill below a pinned or placed one keeps
+        its offset from it in the layout. The rest are placed as one block,
+        right of the pinned skills if there are any.
+
+        Where that spot is taken, the skill goes to the closest free one around
+        it, inside bounds ((x, y, width, height), e.g. the canvas) if possible.
+        Only spots up to search_radius away are tried, so placing stays linear
+        however crowded the pinned skills are; a skill with no free spot that
+        close is put in a column right of everything else.
+        """
+        positions = self.positions()
+        pinned = {}
+        for skill in skills:
+            if skill['x'] is not None and skill['y'] is not None:
+                pinned.setdefault(skill['name'], (skill['x'], skill['y']))
+
+        # Skills without a pinned one above them are placed as a block, as laid out
+        anchored = set(pinned)
+        floating = []
+        for v in self.preorder[1:]:
+            name = self.names[v]
+            if name in anchored:
+                continue
+            if self.parent[v] > 0 and self.names[self.parent[v]] in anchored:
+                anchored.add(name)
+            else:
+                floating.append(name)
+        block_offset = (0, 0)
+        if floating:
+            margin = Skill.outer_radius + 10
+            min_x = min(positions[name][0] for name in floating)
+            min_y = min(positions[name][1] for name in floating)
+            if pinned:
+                left = max(x for x, y in pinned.values()) + self.node_distance
+                top = min(y for x, y in pinned.values())
+            else:
+                left = top = margin
+            block_offset = (left - min_x, top - min_y)
+
+        # Every skill with coordinates, duplicates included, is in the way
+        occupied = SpatialGrid(cell_size=self.clearance)
+        for skill in skills:
+            if skill['x'] is not None and skill['y'] is not None:
+                occupied.insert((skill['x'], skill['y']), (skill['x'], skill['y'], 0, 0))
+
+        placed_at = {}
+        overflow = None
+        for v in self.preorder[1:]:  # Parents before their children
+            name = self.names[v]
+            if name in pinned:
+                continue
+            x, y = positions[name]
+            if self.parent[v] > 0:
+                parent = self.names[self.parent[v]]
+                parent_x, parent_y = pinned.get(parent) or placed_at[parent]
+                x += parent_x - positions[parent][0]
+                y += parent_y - positions[parent][1]
+            else:
+                x += block_offset[0]
+                y += block_offset[1]
+
+            spot = self.free_spot(round(x), round(y), occupied, bounds)
+            if spot is None:
+                if overflow is None:
+                    overflow = self.overflow_spots(list(pinned.values()) + list(placed_at.values()))
+                spot = next(spot for spot in overflow if not self.crowded(*spot, occupied))
+            placed_at[name] = spot
+            occupied.insert(spot, (*spot, 0, 0))
+
+        placed = 0
+        for skill in skills:
+            if skill['x'] is not None and skill['y'] is not None:
+                continue
+            skill['x'], skill['y'] = placed_at[skill['name']]
+            placed += 1
+        return placed
+
+    def free_spot(self, x, y, occupied, bounds=None):
+        """
+        The closest spot to (x, y), out of search_offsets around it, that is
+        clearance away from everything in occupied. One whose node is inside
+        bounds is preferred, if any of them can be. None if they're all taken.
+        """
+        if bounds is not None:
+            reach = self.search_radius + Skill.outer_radius
+            if not rects_intersect((x - reach, y - reach, 2 * reach, 2 * reach), bounds):
+                bounds = None  # Nowhere near them, don't bother
+        fallback = None
+        for dx, dy in self.search_offsets:
+            spot = (x + dx, y + dy)
+            inside = bounds is None or self.inside(spot, bounds)
+            if not inside and fallback is not None:
+                continue
+            if self.crowded(*spot, occupied):
+                continue
+            if inside:
+                return spot
+            fallback = spot
+        return fallback
+
+    def overflow_spots(self, taken):
+        """Spots down a column right of the taken points, for skills with nowhere to go near their parent."""
+        x = round(max(x for x, y in taken) + self.node_distance) if taken else 0
+        y = round(min(y for x, y in taken)) if taken else 0
+        while True:
+            yield (x, y)
+            y += self.clearance
+
+    @staticmethod
+    def inside(spot, bounds):
+        """Whether the whole node at spot is inside the (x, y, width, height) bounds."""
+        radius = Skill.outer_radius
+        return (bounds[0] + radius <= spot[0] <= bounds[0] + bounds[2] - radius and
+                bounds[1] + radius <= spot[1] <= bounds[1] + bounds[3] - radius)
+
+    def crowded(self, x, y, occupied):
+        """Whether (x, y) is closer than clearance to a point of occupied, whose cells are clearance wide."""
+        distance = self.clearance
+        return any((x - other_x) ** 2 + (y - other_y) ** 2 < distance ** 2
+                   for other_x, other_y in occupied.query_near(x, y))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import itertools
+import math
+import os
+import pytest
+from skilltree.Skill import Skill
+from skilltree.SkillGraph import SkillGraph
+from skilltree.SkillTree import SkillTree
+from skilltree.TreeLayout import TreeLayout
+
+TEST_CSV = os.path.join(os.path.dirname(__file__), os.pardir, 'test.csv')
+
+
+def write_partly_pinned(path, unpinned_every, start):
+    """test.csv with x and y blanked on every unpinned_every-th row from start. Returns their names."""
+    with open(TEST_CSV, newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows[start::unpinned_every]:
+        row['x'] = row['y'] = ''
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return {row['name'] for row in rows[start::unpinned_every]}
+
+
+@pytest.mark.parametrize('layout', ['top-down', 'radial'])
+@pytest.mark.parametrize('unpinned_every, start', [(3, 0), (3, 1), (3, 2), (2, 0), (1, 0)])
+def test_placed_skills_do_not_overlap(tmp_path, layout, unpinned_every, start):
+    csv_file = str(tmp_path / 'tree.csv')
+    write_partly_pinned(csv_file, unpinned_every, start)
+    tree = SkillTree(csv_file, compiled_cache=False, layout=layout)
+
+    overlapping = [(a.name, b.name) for a, b in itertools.combinations(tree.skills, 2)
+                   if math.dist((a.x, a.y), (b.x, b.y)) < 2 * Skill.outer_radius]
+    assert overlapping == []
+
+
+@pytest.mark.parametrize('layout', ['top-down', 'radial'])
+@pytest.mark.parametrize('unpinned_every, start', [(3, 0), (3, 1), (3, 2), (2, 0), (1, 0)])
+def test_placed_skills_stay_near_their_parent(tmp_path, layout, unpinned_every, start):
+    csv_file = str(tmp_path / 'tree.csv')
+    unpinned = write_partly_pinned(csv_file, unpinned_every, start)
+    tree = SkillTree(csv_file, compiled_cache=False, layout=layout)
+    tree_layout = TreeLayout(tree.graph, layout)
+    positions = tree_layout.positions()
+    by_name = {skill.name: skill for skill in tree.skills}
+
+    too_far = []
+    for name in unpinned:
+        parents = tree.graph.parents[name]
+        if not parents:
+            continue
+        skill, parent = by_name[name], by_name[parents[0]]
+        # Where the layout puts it from its parent, give or take the spots searched around that
+        allowed = math.dist(positions[name], positions[parents[0]]) + tree_layout.search_radius
+        if math.dist((skill.x, skill.y), (parent.x, parent.y)) > allowed:
+            too_far.append(name)
+    assert too_far == []
+
+
+@pytest.mark.parametrize('layout', ['top-down', 'radial'])
+@pytest.mark.parametrize('unpinned_every, start', [(3, 0), (3, 1), (3, 2), (2, 0), (1, 0)])
+def test_placed_skills_are_on_the_canvas(tmp_path, layout, unpinned_every, start):
+    csv_file = str(tmp_path / 'tree.csv')
+    write_partly_pinned(csv_file, unpinned_every, start)
+    tree = SkillTree(csv_file, compiled_cache=False, layout=layout)
+
+    # There is room on the fixed canvas, so it shouldn't have to grow
+    assert not tree.auto_size
+    canvas = tree.canvas_box()
+    assert [skill.name for skill in tree.skills if not TreeLayout.inside((skill.x, skill.y), canvas)] == []
+
+
+def test_crowded_skills_still_get_a_spot():
+    # Pinned skills packed as tightly as placing allows, well past the spots searched around the middle one
+    spacing = TreeLayout(SkillGraph([])).clearance
+    rows = [{'name': f'{col},{row}', 'dependency': '', 'x': col * spacing, 'y': row * spacing}
+            for col in range(-12, 13) for row in range(-12, 13)]
+    rows += [{'name': f'child{i}', 'dependency': '0,0', 'x': None, 'y': None} for i in range(5)]
+    TreeLayout(SkillGraph(rows)).place(rows)
+
+    assert all(row['x'] is not None and row['y'] is not None for row in rows)
+    assert [(a['name'], b['name']) for a, b in itertools.combinations(rows, 2)
+            if math.dist((a['x'], a['y']), (b['x'], b['y'])) < 2 * Skill.outer_radius] == []
+
+
+def test_pinned_skills_stay_put(tmp_path):
+    csv_file = str(tmp_path / 'tree.csv')
+    write_partly_pinned(csv_file, 3, 0)
+    with open(csv_file, newline='') as f:
+        pinned = {row['name']: (int(row['x']), int(row['y'])) for row in csv.DictReader(f) if row['x']}
+    tree = SkillTree(csv_file, compiled_cache=False)
+
+    assert {skill.name: (skill.x, skill.y) for skill in tree.skills if skill.name in pinned} == pinned